@@ -0,0 +1,89 @@
+"""
+Compare the single pass inline scanner (text_to_textnodes) with the
+five pass split pipeline on link-dense and emphasis-dense paragraphs.
+"original" is the pipeline with the split-per-match image and link
+splitters it replaced, "five pass" uses the current splitters.
+
+    python3 bench/bench_inline.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from textnode import TextNode
+from textnode_enhancements import (extract_markdown_images, extract_markdown_links,
+                                   split_nodes_delimiter, split_nodes_image,
+                                   split_nodes_link, text_to_textnodes)
+
+
+def original_split(old_nodes, extract, fmt, text_type):
+    result_nodes = []
+    for node in old_nodes:
+        text = str(node.text)
+        if text == "":
+            continue
+        extracted = extract(text)
+        if extracted == []:
+            result_nodes.append(node)
+        else:
+            for alt_text, url in extracted:
+                split_text = text.split(fmt.format(alt_text, url), 1)
+                result_nodes.append(TextNode(split_text[0], 'text'))
+                result_nodes.append(TextNode(alt_text, text_type, url))
+                text = split_text[1]
+            if split_text[1]:
+                result_nodes.append(TextNode(split_text[1], 'text'))
+    return result_nodes
+
+
+def original_textnodes(text):
+    nodes = original_split([TextNode(text, "text")], extract_markdown_images, '![{}]({})', 'image')
+    nodes = original_split(nodes, extract_markdown_links, '[{}]({})', 'link')
+    nodes = split_nodes_delimiter(nodes, "**", "bold")
+    nodes = split_nodes_delimiter(nodes, "*", "italic")
+    return split_nodes_delimiter(nodes, "`", "code")
+
+
+def five_pass_textnodes(text):
+    nodes = split_nodes_image([TextNode(text, "text")])
+    nodes = split_nodes_link(nodes)
+    nodes = split_nodes_delimiter(nodes, "**", "bold")
+    nodes = split_nodes_delimiter(nodes, "*", "italic")
+    return split_nodes_delimiter(nodes, "`", "code")
+
+
+def best_of(func, text, number, repeat):
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=repeat)) / number
+
+
+def link_dense(count):
+    return ' '.join(f'see [page {i}](/docs/page-{i}) and ![shot {i}](/images/{i}.png)' for i in range(count))
+
+
+def emphasis_dense(count):
+    return ' '.join(f'some **bold {i}** then *italic {i}* and `code_{i}`' for i in range(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'paragraph':<16}{'size':>8}{'original':>12}{'five pass':>12}{'one pass':>12}{'speedup':>9}")
+    for name, make in (('link-dense', link_dense), ('emphasis-dense', emphasis_dense)):
+        for count in (10, 100, 1000):
+            text = make(count)
+            assert text_to_textnodes(text) == five_pass_textnodes(text)
+            number = max(1, 2000 // count)
+            original = best_of(original_textnodes, text, number, args.repeat)
+            old = best_of(five_pass_textnodes, text, number, args.repeat)
+            new = best_of(text_to_textnodes, text, number, args.repeat)
+            print(f'{name:<16}{len(text):>8}{original * 1e3:>10.3f}ms{old * 1e3:>10.3f}ms'
+                  f'{new * 1e3:>10.3f}ms{original / new:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
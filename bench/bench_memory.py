@@ -0,0 +1,77 @@
+"""
+Measure the memory cost of the node classes: bytes per TextNode and per
+HTMLNode as built for a page, for the slotted classes against the
+previous __dict__ based ones, and peak memory of parsing a large page.
+
+    python3 bench/bench_memory.py [--nodes N]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from htmlnode import HTMLNode
+from textnode import TextNode
+from textnode_enhancements import markdown_to_html_node, shared_props
+
+
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+class DictHTMLNode:
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def bytes_per_node(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return (after - before) / count
+
+
+def page_peak(markdown):
+    tracemalloc.start()
+    markdown_to_html_node(markdown)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=200000)
+    args = parser.parse_args()
+
+    urls = [f'/docs/page-{i % 50}' for i in range(args.nodes)]
+    cases = [
+        ('TextNode', lambda i: DictTextNode('some text', 'text'), lambda i: TextNode('some text', 'text')),
+        ('HTMLNode text', lambda i: DictHTMLNode(None, 'some text'), lambda i: HTMLNode(None, 'some text')),
+        ('HTMLNode link',
+         lambda i: DictHTMLNode('a', 'link', None, {'href': urls[i]}),
+         lambda i: HTMLNode('a', 'link', None, shared_props(('href', urls[i])))),
+    ]
+    # list slot per node is included in both columns
+    print(f"{'node':<16}{'dict bytes':>12}{'slotted bytes':>15}")
+    for name, before, after in cases:
+        print(f'{name:<16}{bytes_per_node(before, args.nodes):>12.1f}{bytes_per_node(after, args.nodes):>15.1f}')
+
+    paragraph = ' '.join(f'word **bold** [link](/docs/page-{i % 50}) *it*' for i in range(20))
+    markdown = '# Title\n\n' + '\n\n'.join(paragraph for _ in range(500))
+    print(f'peak while parsing a {len(markdown) / 1e6:.1f} MB page: {page_peak(markdown) / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Deterministic synthetic markdown corpus for the benchmarks. The same seed
+and size always produce byte-identical files.
+
+    python3 bench/corpus.py OUTPUT_DIR [--pages N] [--seed S] [--depth D]
+"""
+import argparse
+import os
+import random
+
+WORDS = (
+    'ring hobbit shire elf dwarf wizard mountain river forest tower road '
+    'journey council sword bow song lore king steward fellowship shadow '
+    'light star ship harbour gate bridge mine horse eagle dragon'
+).split()
+
+
+class CorpusGenerator:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def words(self, count):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
+
+    def paragraph(self):
+        return '\n'.join(self.words(self.rng.randint(8, 16)).capitalize() + '.'
+                         for _ in range(self.rng.randint(2, 6)))
+
+    def link_heavy(self):
+        parts = []
+        for i in range(self.rng.randint(10, 30)):
+            parts.append(f'see [{self.words(2)}](/docs/{self.rng.choice(WORDS)}-{i})')
+            if i % 5 == 0:
+                parts.append(f'![{self.words(2)}](/images/{self.rng.choice(WORDS)}.png)')
+        return ' '.join(parts)
+
+    def emphasis_heavy(self):
+        styles = ('**{}**', '*{}*', '`{}`', '{}')
+        return ' '.join(self.rng.choice(styles).format(self.words(self.rng.randint(1, 3)))
+                        for _ in range(self.rng.randint(20, 60)))
+
+    def long_list(self):
+        ordered = self.rng.random() < 0.4
+        items = []
+        for i in range(self.rng.randint(10, 80)):
+            marker = f'{i + 1}.' if ordered else self.rng.choice(('*', '-'))
+            items.append(f'{marker} {self.words(self.rng.randint(3, 10))}')
+        return '\n'.join(items)
+
+    def code_fence(self):
+        lines = [f'    {self.rng.choice(WORDS)}_{i} = call({self.words(3)!r})'
+                 for i in range(self.rng.randint(20, 200))]
+        return '```\ndef main():\n' + '\n'.join(lines) + '\n```'
+
+    def quote(self):
+        return '> ' + self.words(self.rng.randint(10, 30))
+
+    def page(self, title):
+        kinds = (self.paragraph, self.paragraph, self.link_heavy, self.emphasis_heavy,
+                 self.long_list, self.code_fence, self.quote)
+        blocks = [f'# {title}']
+        for _ in range(self.rng.randint(5, 40)):
+            if self.rng.random() < 0.15:
+                blocks.append(f'{"#" * self.rng.randint(2, 4)} {self.words(3)}')
+            blocks.append(self.rng.choice(kinds)())
+        return '\n\n'.join(blocks) + '\n'
+
+
+def generate_corpus(root, pages=200, seed=0, depth=4):
+    """
+    Write pages markdown files under root, spread over a directory tree
+    up to depth levels deep. Returns the paths written, in order
+    """
+    generator = CorpusGenerator(seed)
+    paths = []
+    for i in range(pages):
+        parts = [f'section-{generator.rng.randint(0, 3)}' for _ in range(generator.rng.randint(0, depth))]
+        path = os.path.join(root, *parts, f'page-{i}.md' if i else 'index.md')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(generator.page(f'Page {i}: {generator.words(3)}'))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=4)
+    args = parser.parse_args()
+    paths = generate_corpus(args.output, args.pages, args.seed, args.depth)
+    print(f'wrote {len(paths)} pages to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Time every stage of the pipeline on a synthetic corpus and print the
+results as JSON, so runs on different commits can be compared.
+
+    python3 bench/run.py [--pages N] [--seed S] [--repeat R] [--output FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import generate_corpus
+from site_generation import generate_pages_recursive
+from template import Template
+from textnode_enhancements import BlockScanner, markdown_to_blocks, markdown_to_html_node, text_to_children
+
+TEMPLATE_PATH = os.path.join(BENCH_DIR, '..', 'template.html')
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def inline_texts(markdowns):
+    texts = []
+    for markdown in markdowns:
+        for block in BlockScanner(markdown):
+            if block.items is not None:
+                texts.extend(block.items)
+            elif block.block_type != 'code':
+                texts.append(block.content)
+    return texts
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pages, seed, repeat):
+    root = tempfile.mkdtemp(prefix='ssg-bench-')
+    try:
+        content = os.path.join(root, 'content')
+        paths = generate_corpus(content, pages, seed)
+        markdowns = []
+        for path in paths:
+            with open(path, 'r') as file:
+                markdowns.append(file.read())
+        total_bytes = sum(len(markdown.encode()) for markdown in markdowns)
+        with open(TEMPLATE_PATH, 'r') as file:
+            template = Template(file.read())
+
+        texts = inline_texts(markdowns)
+        trees = [markdown_to_html_node(markdown) for markdown in markdowns]
+        bodies = [tree.to_html() for tree in trees]
+
+        def full_build():
+            output = os.path.join(root, 'public')
+            shutil.rmtree(output, ignore_errors=True)
+            generate_pages_recursive(content, TEMPLATE_PATH, output)
+
+        stages = {
+            'markdown_to_blocks': lambda: [markdown_to_blocks(markdown) for markdown in markdowns],
+            'text_to_children': lambda: [text_to_children(text) for text in texts],
+            'markdown_to_html_node': lambda: [markdown_to_html_node(markdown) for markdown in markdowns],
+            'to_html': lambda: [tree.to_html() for tree in trees],
+            'template_fill': lambda: [template.render({'Title': 'Title', 'Content': body}) for body in bodies],
+            'generate_pages_recursive': full_build,
+        }
+        results = {}
+        for name, func in stages.items():
+            seconds = best_time(func, repeat)
+            results[name] = {
+                'seconds': round(seconds, 6),
+                'pages_per_sec': round(pages / seconds, 1),
+                'mb_per_sec': round(total_bytes / 1e6 / seconds, 3),
+            }
+        return {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'pages': pages,
+            'seed': seed,
+            'corpus_bytes': total_bytes,
+            'stages': results,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+
+    result = json.dumps(run(args.pages, args.seed, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(result + '\n')
+    else:
+        print(result)
+
+
+if __name__ == '__main__':
+    main()
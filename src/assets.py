@@ -0,0 +1,159 @@
+import json
+import os
+import posixpath
+import re
+from urllib.parse import unquote, urlsplit
+from build_manifest import hash_bytes
+from textnode_enhancements import BLOCK_PATTERN, INLINE_PATTERN, make_block
+
+# static files worth a long-lived cache; names like favicon.ico and
+# robots.txt are fetched by fixed URL and keep them
+FINGERPRINT_SUFFIXES = ('.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif',
+                        '.woff', '.woff2')
+HASH_LENGTH = 8
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+
+HTML_URL_PATTERN = re.compile(r'''(\b(?:href|src)\s*=\s*["'])([^"']+)(["'])''')
+CSS_URL_PATTERN = re.compile(r'''(url\(\s*["']?)([^"')\s]+)(["']?\s*\))''')
+
+
+def fingerprinted_path(rel_path, digest):
+    """'css/index.css' -> 'css/index.<first HASH_LENGTH hex digits of digest>.css'"""
+    base, ext = os.path.splitext(rel_path)
+    return f'{base}.{digest[:HASH_LENGTH]}{ext}'
+
+def resolve(url, base_url):
+    """
+    The site path url points at from the page or file at base_url, without
+    query or fragment, or None if url leaves the site or stays on the page
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith('/'):
+        path = posixpath.join(posixpath.dirname(base_url), path)
+    resolved = posixpath.normpath(path)
+    if path.endswith('/') and resolved != '/':
+        resolved += '/'
+    return resolved
+
+def page_base(src_path, content_dir):
+    """
+    The URL of the directory a page is served from, '/blog/' for
+    content/blog/post.md with content_dir content; '/' without either
+    """
+    if src_path is None or content_dir is None:
+        return '/'
+    rel_dir = os.path.relpath(os.path.dirname(src_path), content_dir).replace(os.sep, '/')
+    return '/' if rel_dir == '.' else f'/{rel_dir}/'
+
+
+
+class AssetMap:
+    """
+    The site URL of every fingerprinted static file mapped to the URL of
+    its content-hashed copy, used to point templates, stylesheets and
+    markdown links and images at the copies. path is where the map was
+    saved, as JSON, and stands for the map among a page's inputs
+    """
+    def __init__(self, urls=None, path=None):
+        self.urls = urls if urls is not None else {}
+        self.path = path
+
+    def url(self, url, base_url=None):
+        """
+        The URL to use in place of url: the fingerprinted copy of the asset
+        it points at, keeping any query and fragment, or url itself.
+        Without a base_url, only root-relative URLs are looked up
+        """
+        if base_url is None and not url.startswith('/'):
+            return url
+        path = resolve(url, base_url or '/')
+        hashed = self.urls.get(path) if path is not None else None
+        if hashed is None:
+            return url
+        parts = urlsplit(url)
+        if parts.query:
+            hashed += f'?{parts.query}'
+        if parts.fragment:
+            hashed += f'#{parts.fragment}'
+        return hashed
+
+    def _rewrite(self, pattern, text, base_url=None):
+        return pattern.sub(lambda m: m.group(1) + self.url(m.group(2), base_url) + m.group(3), text)
+
+    def rewrite_html(self, text):
+        """
+        Point the root-relative href and src attributes in text at the
+        fingerprinted copies; relative ones are left alone, as the
+        template they are used in is served at every depth
+        """
+        return self._rewrite(HTML_URL_PATTERN, text)
+
+    def rewrite_css(self, text, base_url='/'):
+        """Point the url() references of the stylesheet served at base_url at the fingerprinted copies"""
+        return self._rewrite(CSS_URL_PATTERN, text, base_url)
+
+    def rewrite_markdown(self, text, base_url='/'):
+        """
+        Point the links and images of markdown text, from a page in the
+        directory base_url, at the fingerprinted copies. Code is left as is
+        """
+        if '](' not in text:
+            return text
+        return BLOCK_PATTERN.sub(lambda m: self._rewrite_block(m.group(), base_url), text)
+
+    def rewrite_markdown_lines(self, lines, base_url='/'):
+        """rewrite_markdown over an iterable of lines, holding one block at a time"""
+        pending = []
+        for line in lines:
+            if line.rstrip('\n').rstrip('\r'):
+                pending.append(line)
+                continue
+            if pending:
+                yield from self._rewrite_block(''.join(pending), base_url).splitlines(keepends=True)
+                pending = []
+            yield line
+        if pending:
+            yield from self._rewrite_block(''.join(pending), base_url).splitlines(keepends=True)
+
+    def _rewrite_block(self, raw, base_url):
+        # the renderer's rules: code blocks are left as they are, and list
+        # items, like the rest, are split into inline nodes by INLINE_PATTERN
+        if '](' not in raw:
+            return raw
+        block = make_block(raw, 1)
+        if block is None or block.block_type == 'code':
+            return raw
+        rewrite = lambda m: self._rewrite_inline(m, base_url)
+        if block.items is not None:
+            return '\n'.join(INLINE_PATTERN.sub(rewrite, line) for line in raw.split('\n'))
+        return INLINE_PATTERN.sub(rewrite, raw)
+
+    def _rewrite_inline(self, match, base_url):
+        index = match.lastindex
+        if index != 2 and index != 4:
+            # bold, italic and code hold no links
+            return match.group()
+        offset = match.start()
+        start, end = match.span(index)
+        text = match.group()
+        return text[:start - offset] + self.url(match[index], base_url) + text[end - offset:]
+
+    def to_json(self):
+        return json.dumps(self.urls, indent=1, sort_keys=True) + '\n'
+
+    def digest(self):
+        return hash_bytes(self.to_json().encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as file:
+            return cls(json.load(file), path)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, AssetMap) and self.urls == other.urls
+
+    def __repr__(self) -> str:
+        return f'AssetMap({len(self.urls)} assets)'
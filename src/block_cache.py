@@ -0,0 +1,87 @@
+import os
+import pickle
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class BlockCache:
+    """
+    Bounded LRU cache of rendered block HTML keyed on (block type, block
+    text), so blocks repeated across pages are parsed and serialized once.
+    Each entry is (html, counts), counts being the search terms of the
+    block's text once a page asked for them, else None
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key, html):
+        self.entries[key] = html
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"block cache: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']} entries")
+
+    def save(self, path, version):
+        """
+        Write the entries to path, tagged with the renderer version, through
+        a temporary file of this process, so shards saving at once do not
+        write into each other's
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((version, list(self.entries.items())), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, version, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Read a cache written by save. A missing or unreadable file, or one
+        written by another renderer version, gives an empty cache
+        """
+        cache = cls(max_entries)
+        try:
+            with open(path, 'rb') as file:
+                saved_version, items = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return cache
+        if saved_version == version:
+            for key, entry in items[-max_entries:]:
+                cache.entries[key] = entry
+        return cache
+
+    def __getstate__(self):
+        # counters stay with the process that made them
+        return {'max_entries': self.max_entries, 'entries': self.entries}
+
+    def __setstate__(self, state):
+        self.max_entries = state['max_entries']
+        self.entries = state['entries']
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+
+MANIFEST_FORMAT = 2
+
+# Modules whose code decides what a rendered page looks like. A change to
+# any of them invalidates every page recorded in an existing manifest.
+GENERATOR_SOURCES = (
+    'site_generation.py',
+    'template.py',
+    'textnode_enhancements.py',
+    'htmlnode.py',
+    'textnode.py',
+    'assets.py',
+    'images.py',
+    'terms.py',
+)
+# The subset that turns markdown into body HTML; the template is not involved.
+# what the page cache keeps: parsed pages and the search terms counted from them
+PARSER_SOURCES = (
+    'textnode_enhancements.py',
+    'htmlnode.py',
+    'textnode.py',
+    'terms.py',
+)
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sources_version(names):
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(name.encode())
+        with open(os.path.join(src_dir, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path, manifest=None):
+    """
+    The manifest a build step works on: manifest, when the caller loaded
+    it once for the whole build and saves it at the end, else the one at
+    manifest_path, or None without either
+    """
+    if manifest is not None:
+        return manifest
+    return BuildManifest.load(manifest_path) if manifest_path else None
+
+def generator_version():
+    return sources_version(GENERATOR_SOURCES)
+
+
+def parser_version():
+    return sources_version(PARSER_SOURCES)
+
+
+class BuildManifest:
+    """
+    Persistent record of what the last build produced: for every page the
+    output it was written to, the hash of every input that output was
+    rendered from (the markdown source, the template) and why it was last
+    rebuilt, plus the generator version the pages were rendered with, the
+    static files copied into the output, the gzip sidecars written and
+    the content hashes and sizes of static files, kept to skip rehashing.
+
+    The inputs form the build's dependency graph: dependents() maps a set
+    of changed paths to exactly the pages that have to be rendered again.
+    """
+    def __init__(self, path, version=None, pages=None, assets=None, sidecars=None, asset_hashes=None,
+                 image_sizes=None, shard=None):
+        self.path = path
+        self.version = version
+        # src_path -> {'output': dst_path, 'deps': {path: hash}, 'reason': str}
+        self.pages = pages if pages is not None else {}
+        # destination paths of the static files copied by the last sync
+        self.assets = assets if assets is not None else []
+        # gz_path -> [size, mtime_ns, ctime_ns, sha256] of the file compress.compress_tree compressed into it
+        self.sidecars = sidecars if sidecars is not None else {}
+        # src_path -> [size, mtime_ns, sha256] of the static files fingerprinted
+        self.asset_hashes = asset_hashes if asset_hashes is not None else {}
+        # src_path -> [size, mtime_ns, sha256, width, height] of the images probed by images.probe_images
+        self.image_sizes = image_sizes if image_sizes is not None else {}
+        # for one shard of a sharded build: {'index': i, 'count': n, 'pages': every source path of the site}
+        self.shard = shard
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get('format') != MANIFEST_FORMAT:
+            return cls(path)
+        sidecars = data.get('sidecars', {})
+        if isinstance(sidecars, list):
+            # recorded without the state of their files: made again once
+            sidecars = dict.fromkeys(sidecars)
+        return cls(path, data.get('version'), data.get('pages', {}), data.get('assets', []),
+                   sidecars, data.get('asset_hashes', {}), data.get('image_sizes', {}),
+                   data.get('shard'))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {
+            'format': MANIFEST_FORMAT,
+            'version': self.version,
+            'pages': self.pages,
+            'assets': self.assets,
+            'sidecars': self.sidecars,
+            'asset_hashes': self.asset_hashes,
+            'image_sizes': self.image_sizes,
+            'shard': self.shard,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, version):
+        """Forget every recorded input if the pages were rendered by other code."""
+        if self.version != version:
+            for entry in self.pages.values():
+                entry['deps'] = {}
+        self.version = version
+
+    def stale_reason(self, src_path, dst_path, hashes):
+        """
+        Return why the page at src_path has to be rendered again, or None
+        if it is up to date. hashes maps an input path to its current hash.
+        """
+        entry = self.pages.get(src_path)
+        if entry is None:
+            return 'new page'
+        if not entry.get('deps'):
+            return 'generator changed'
+        if entry.get('output') != dst_path:
+            return 'output moved'
+        for dep_path in sorted(entry['deps'].keys() | hashes.keys()):
+            if hashes.get(dep_path) != entry['deps'].get(dep_path):
+                return f'{dep_path} changed'
+        if not os.path.isfile(dst_path):
+            return 'output missing'
+        return None
+
+    def record(self, src_path, dst_path, deps, reason):
+        self.pages[src_path] = {'output': dst_path, 'deps': deps, 'reason': reason}
+
+    def dependents(self, changed_paths):
+        """
+        Return the source paths of the pages that depend on any of
+        changed_paths. Paths are compared absolute, so a change reported
+        as /srv/site/content/a.md matches the recorded content/a.md
+        """
+        changed = {os.path.abspath(path) for path in changed_paths}
+        return {
+            src_path for src_path, entry in self.pages.items()
+            if any(os.path.abspath(dep_path) in changed for dep_path in entry.get('deps', ()))
+        }
+
+    def find(self, path):
+        """Return (src_path, entry) for the page whose source or output is path, or None."""
+        path = os.path.abspath(path)
+        for src_path, entry in self.pages.items():
+            if path in (os.path.abspath(src_path), os.path.abspath(entry.get('output', ''))):
+                return src_path, entry
+        return None
+
+    def forget_missing(self, src_paths):
+        """Drop pages whose source is gone and return the outputs they left behind."""
+        orphaned = []
+        for src_path in list(self.pages):
+            if src_path not in src_paths:
+                orphaned.append(self.pages.pop(src_path)['output'])
+        return orphaned
@@ -0,0 +1,128 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from build_manifest import hash_file, load_manifest
+from site_generation import remove_empty_dirs
+from walker import walk_files
+
+# text formats worth precompressing; images and fonts are compressed already
+COMPRESS_SUFFIXES = ('.html', '.css', '.js', '.mjs', '.json', '.svg', '.xml', '.txt', '.map')
+# below this many bytes the gzip framing costs more than it saves
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 9
+# zlib releases the GIL while compressing, so threads use every core
+COMPRESS_THREADS = os.cpu_count() or 1
+
+
+class CompressReport:
+    def __init__(self):
+        self.compressed = []
+        self.unchanged = []
+        self.removed = []
+
+    def summary(self):
+        return (f'{len(self.compressed)} files gzipped, {len(self.unchanged)} unchanged, '
+                f'{len(self.removed)} removed')
+
+
+def gzip_file(path, level=DEFAULT_LEVEL):
+    """
+    Write path.gz next to path. The archive has no name or timestamp in
+    it, so the same input always gives the same bytes, and it is given
+    the mtime of path
+    """
+    gz_path = path + '.gz'
+    tmp_path = f'{gz_path}.{os.getpid()}.tmp'
+    stat = os.stat(path)
+    with open(path, 'rb') as file:
+        data = gzip.compress(file.read(), compresslevel=level, mtime=0)
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, gz_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return gz_path
+
+def sidecar_fresh(path, stat, recorded):
+    """
+    Whether path.gz was made from the file as it is now, given the
+    [size, mtime_ns, ctime_ns, sha256] recorded for the file when it was
+    compressed. Returns (fresh, sha256 of the file now). Copies keep the
+    mtime of their source, but every write moves the ctime, so the file
+    is only hashed again when that or the size changed
+    """
+    if recorded is None or not os.path.isfile(path + '.gz'):
+        return False, hash_file(path)
+    if recorded[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns]:
+        return True, recorded[3]
+    digest = hash_file(path)
+    return digest == recorded[3], digest
+
+def compress_tree(root, manifest_path=None, level=DEFAULT_LEVEL, min_size=DEFAULT_MIN_SIZE,
+                  threads=COMPRESS_THREADS, manifest=None):
+    """
+    Keep a .gz sidecar next to every text file under root of at least
+    min_size bytes, for servers that send precompressed files (nginx
+    gzip_static). With a manifest_path, the size, times and hash of every
+    file compressed are recorded, so a sidecar is only made again when
+    its file's content changed, and sidecars made by an earlier run whose
+    file is gone or now too small are removed; other .gz files are never
+    touched. Without one, every sidecar is made again. A BuildManifest
+    given as manifest is used in place of manifest_path and left to the
+    caller to save
+    """
+    report = CompressReport()
+    save = manifest is None
+    manifest = load_manifest(manifest_path, manifest)
+    known = manifest.sidecars if manifest is not None else {}
+    sidecars = {}
+    stale = []
+    for _, entry in walk_files(root, ()):
+        if not entry.name.endswith(COMPRESS_SUFFIXES):
+            continue
+        stat = entry.stat()
+        if stat.st_size < min_size:
+            continue
+        gz_path = entry.path + '.gz'
+        fresh, digest = sidecar_fresh(entry.path, stat, known.get(gz_path))
+        sidecars[gz_path] = [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, digest]
+        if fresh:
+            report.unchanged.append(gz_path)
+        else:
+            stale.append(entry.path)
+
+    if manifest is not None:
+        for gz_path in known:
+            if gz_path not in sidecars and os.path.isfile(gz_path):
+                os.remove(gz_path)
+                report.removed.append(gz_path)
+                remove_empty_dirs(os.path.dirname(gz_path), root)
+        manifest.sidecars = sidecars
+        if save:
+            manifest.save()
+
+    if len(stale) > 1 and threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            report.compressed = list(pool.map(lambda path: gzip_file(path, level), stale))
+    else:
+        report.compressed = [gzip_file(path, level) for path in stale]
+    return report
+
+def remove_sidecars(root, manifest):
+    """
+    Remove every sidecar the manifest lists, for a build that no longer
+    compresses: left in place they would be served for outputs that have
+    moved on since. The manifest is left to the caller to save
+    """
+    report = CompressReport()
+    for gz_path in manifest.sidecars:
+        if os.path.isfile(gz_path):
+            os.remove(gz_path)
+            report.removed.append(gz_path)
+            remove_empty_dirs(os.path.dirname(gz_path), root)
+    manifest.sidecars = {}
+    return report
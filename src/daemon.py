@@ -0,0 +1,286 @@
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from assets import AssetMap
+from images import ImageSizes
+from site_generation import RenderOptions, render_markdown
+from template import load_template
+
+DEFAULT_SOCKET_PATH = os.path.join('.ssg-cache', 'daemon.sock')
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_TIMEOUT = 30.0
+# a request is one line of JSON; anything longer is refused unread
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+OPS = ('render', 'build', 'stats', 'shutdown')
+
+
+class PageRenderer:
+    """
+    Render markdown strings the way the build renders pages, keeping the
+    compiled template, asset map and image sizes in memory and loading
+    them again only when their files change. Renders take turns, as the
+    block cache is not thread-safe
+    """
+    def __init__(self, template_path, block_cache=None, page_cache=None, asset_map_path=None,
+                 image_sizes_path=None):
+        self.template_path = template_path
+        self.block_cache = block_cache
+        self.page_cache = page_cache
+        self.asset_map_path = asset_map_path
+        self.image_sizes_path = image_sizes_path
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+    def _load(self, path, loader):
+        """Return loader(path), reusing the last result while the file is unchanged; None if there is no file"""
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self.loaded.get(path)
+        if cached is None or cached[0] != key:
+            cached = self.loaded[path] = (key, loader(path))
+        return cached[1]
+
+    def render(self, markdown_text):
+        with self.lock:
+            template = load_template(self.template_path)
+            asset_map = self._load(self.asset_map_path, AssetMap.load)
+            image_sizes = self._load(self.image_sizes_path, ImageSizes.load)
+            if asset_map is not None:
+                cached = self.loaded.get('mapped template')
+                if cached is None or cached[0] is not template or cached[1] is not asset_map:
+                    cached = self.loaded['mapped template'] = (template, asset_map,
+                                                               template.map_literals(asset_map.rewrite_html))
+                template = cached[2]
+            options = RenderOptions(template, self.block_cache, self.page_cache, asset_map, image_sizes)
+            return ''.join(render_markdown(markdown_text, options))
+
+
+class DaemonStats:
+    def __init__(self):
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def record(self, op, seconds):
+        with self.lock:
+            count, total, slowest = self.requests.get(op, (0, 0.0, 0.0))
+            self.requests[op] = (count + 1, total + seconds, max(slowest, seconds))
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'in_flight': self.in_flight,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'requests': {
+                    op: {'count': count, 'mean_ms': round(total / count * 1000, 2),
+                         'max_ms': round(slowest * 1000, 2)}
+                    for op, (count, total, slowest) in sorted(self.requests.items())
+                },
+            }
+
+
+class BuildDaemon:
+    """
+    Answer build requests while keeping the generator and its caches
+    warm between them. At most max_concurrent requests run at once; a
+    request waiting longer than timeout for its turn is refused as busy,
+    and one running longer is answered with a timeout while its work
+    finishes in the background. Builds write the output tree, so they
+    run one at a time
+    """
+    def __init__(self, build, renderer, max_concurrent=DEFAULT_MAX_CONCURRENT, timeout=DEFAULT_TIMEOUT,
+                 cache_stats=None):
+        self.build = build
+        self.renderer = renderer
+        self.timeout = timeout
+        self.cache_stats = cache_stats
+        self.stats = DaemonStats()
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.build_lock = threading.Lock()
+        self.last_build = None
+        self.server = None
+
+    def handle(self, request):
+        """Answer one request, a dict with an 'op', with a dict that has 'ok' and, if not ok, 'error'"""
+        started = time.perf_counter()
+        op = request.get('op') if isinstance(request, dict) else None
+        if op == 'stats':
+            response = {'ok': True, 'stats': self.stats_dict()}
+        elif op == 'shutdown':
+            response = {'ok': True}
+            if self.server is not None:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif op in ('render', 'build'):
+            response = self._run_limited(op, request)
+        else:
+            response = {'ok': False, 'error': f'unknown op {op!r}'}
+        if not response['ok']:
+            self.stats.count('errors')
+        self.stats.record(op if op in OPS else 'invalid', time.perf_counter() - started)
+        return response
+
+    def _run_limited(self, op, request):
+        if not self.slots.acquire(timeout=self.timeout):
+            self.stats.count('rejected')
+            return {'ok': False, 'error': 'busy'}
+        with self.stats.lock:
+            self.stats.in_flight += 1
+        try:
+            future = self.pool.submit(self._render if op == 'render' else self._build, request)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.stats.count('timeouts')
+            return {'ok': False, 'error': f'timed out after {self.timeout} s'}
+        except Exception as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+    def _release(self):
+        with self.stats.lock:
+            self.stats.in_flight -= 1
+        self.slots.release()
+
+    def _render(self, request):
+        markdown_text = request.get('markdown')
+        if not isinstance(markdown_text, str):
+            return {'ok': False, 'error': 'render needs a markdown string'}
+        return {'ok': True, 'html': self.renderer.render(markdown_text)}
+
+    def _build(self, request):
+        """
+        Rebuild the pages depending on request['paths'], absolute or from
+        the build root, or everything without paths
+        """
+        paths = request.get('paths')
+        if paths is not None and not (isinstance(paths, list) and all(isinstance(path, str) for path in paths)):
+            return {'ok': False, 'error': 'paths must be a list of strings'}
+        output = io.StringIO()
+        with self.build_lock:
+            # only builds print, and only one runs at a time
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                status = self.build(paths)
+            self.last_build = {'status': status, 'finished': time.time()}
+        lines = output.getvalue().splitlines()
+        if status != 0:
+            return {'ok': False, 'error': 'build failed', 'output': lines}
+        return {'ok': True, 'output': lines}
+
+    def stats_dict(self):
+        stats = self.stats.to_dict()
+        stats['last_build'] = self.last_build
+        if self.cache_stats is not None:
+            stats['caches'] = self.cache_stats()
+        return stats
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    daemon = None
+    # an idle connection is closed after this many seconds
+    timeout = DEFAULT_TIMEOUT
+
+    def handle(self):
+        while True:
+            try:
+                line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            except (socket.timeout, ConnectionResetError):
+                return
+            if not line:
+                return
+            if len(line) > MAX_REQUEST_BYTES:
+                self.respond({'ok': False, 'error': 'request too large'})
+                return
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'ok': False, 'error': f'invalid JSON: {e}'}
+            else:
+                response = self.daemon.handle(request)
+            if not self.respond(response):
+                return
+
+    def respond(self, response):
+        try:
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        return True
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def remove_stale_socket(path):
+    """Remove a socket left by a daemon that is gone; raise if one is still listening on it"""
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+            return
+    raise Exception(f'a daemon is already listening on {path}')
+
+def make_server(daemon, socket_path):
+    """Bind a server for daemon to socket_path, readable and writable by this user only"""
+    os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+    remove_stale_socket(socket_path)
+    handler = type('Handler', (DaemonRequestHandler,), {'daemon': daemon, 'timeout': daemon.timeout})
+    server = DaemonServer(socket_path, handler)
+    os.chmod(socket_path, 0o600)
+    daemon.server = server
+    return server
+
+def run_daemon(daemon, socket_path=DEFAULT_SOCKET_PATH):
+    server = make_server(daemon, socket_path)
+    print(f'Listening on {socket_path}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.pool.shutdown(wait=False)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def request(socket_path, payload, timeout=DEFAULT_TIMEOUT):
+    """Send one request to the daemon on socket_path and return its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(payload).encode() + b'\n')
+        with client.makefile('rb') as reply:
+            line = reply.readline()
+    if not line:
+        raise Exception('the daemon closed the connection without answering')
+    return json.loads(line)
@@ -1,6 +1,9 @@
 import html
 
 class HTMLNode:
+    # no per-instance __dict__: pages are built from very many small nodes
+    __slots__ = ('tag', 'value', 'children', 'props')
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -8,27 +11,44 @@ class HTMLNode:
         self.props = props
 
     def to_html(self):
-        html = ""
+        return ''.join(self.iter_html())
+
+    def iter_html(self):
+        """
+        Yield the node's HTML as string fragments, depth first, without
+        building the intermediate strings of every subtree
+        """
         if self.tag:
-            html += f"<{self.tag}"
-            html += self.props_to_html()  # Use the props_to_html method here
-            html += ">"
-        
+            yield f"<{self.tag}{self.props_to_html()}>"
+
         if self.children:
             for child in self.children:
                 if isinstance(child, HTMLNode):
-                    html += child.to_html()
+                    yield from child.iter_html()
                 elif isinstance(child, str):
-                    html += child
+                    yield child
                 else:
                     raise ValueError(f"Invalid child type: {type(child)}")
         
         if self.value:
-            html += self.value
+            yield self.value
         
         if self.tag:
-            html += f"</{self.tag}>"
-        return html
+            yield f"</{self.tag}>"
+
+    def iter_text(self):
+        """Yield the text content of the node and its descendants, without markup"""
+        if self.children:
+            for child in self.children:
+                if isinstance(child, HTMLNode):
+                    yield from child.iter_text()
+                elif isinstance(child, str):
+                    yield child
+        if self.value:
+            yield self.value
+
+    def write_html(self, fp):
+        fp.writelines(self.iter_html())
         
     def props_to_html(self):
         if not self.props:
@@ -45,23 +65,27 @@ class HTMLNode:
     
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, value, tag = None, props = None):
        super().__init__(tag, value, None, props)
 
-    def to_html(self):
+    def iter_html(self):
         if self.value is None:
             raise ValueError("leafnode must have a value")
         if self.tag is None:
-            return str(self.value)
+            yield str(self.value)
+            return
         
         #print(f'Debug: LeafNode with tag "{self.tag}" and value "{self.value}"')
         escaped_value = html.escape(self.value)
         match self.tag:
             case "p":
-                return f'<{self.tag}>{escaped_value}</{self.tag}>'
+                yield f'<{self.tag}>{escaped_value}</{self.tag}>'
             case "a":
-                return f'<a{self.props_to_html()}>{escaped_value}</a>'
-        return f'<{self.tag}>{escaped_value}</{self.tag}>'
+                yield f'<a{self.props_to_html()}>{escaped_value}</a>'
+            case _:
+                yield f'<{self.tag}>{escaped_value}</{self.tag}>'
             
     def __eq__(self, other) -> bool:
         return (
@@ -74,21 +98,18 @@ class LeafNode(HTMLNode):
         return f'LeafNode(value={self.value}, tag={self.tag}, props={self.props})'
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children,  props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def iter_html(self):
         if self.tag is None:
             raise ValueError("Tag needs to be specified")
         if self.children is None or len(self.children) == 0:
             raise ValueError("Children needs to be specified")
         
-        child_res = ""
+        yield f'<{self.tag}>'
         for child in self.children:
-            child_html = child.to_html()
-            if child_html is None:
-                raise ValueError("Encountered a child with no valid HTML content")
-            #print(f'Debug: child.to_html() returned {child_html}')  # Debug print
-            child_res += str(child_html)
-
-        return f'<{self.tag}>{child_res}</{self.tag}>'
\ No newline at end of file
+            yield from child.iter_html()
+        yield f'</{self.tag}>'
@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import struct
+from assets import resolve
+from build_manifest import hash_bytes, hash_file, load_manifest
+from site_generation import write_page
+from walker import DEFAULT_IGNORE, walk_files
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# the JPEG frame headers, which hold the size; C4, C8 and CC sit in the same range but are not frames
+JPEG_FRAME_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+IMG_TAG_PATTERN = re.compile(r'<img\b[^>]*>')
+IMG_SRC_PATTERN = re.compile(r'''\bsrc\s*=\s*["']([^"']*)["']''')
+
+
+def image_size(path):
+    """
+    Return (width, height) of the PNG, GIF, WebP or JPEG image at path,
+    read from its header without decoding any pixels, or None for any
+    other or truncated file
+    """
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(32)
+            if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+                return struct.unpack('>II', head[16:24])
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return struct.unpack('<HH', head[6:10])
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                return _webp_size(head)
+            if head[:2] == b'\xff\xd8':
+                file.seek(2)
+                return _jpeg_size(file)
+    except struct.error:
+        pass
+    return None
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b'VP8L':
+        (bits,) = struct.unpack('<I', head[21:25])
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X':
+        return (int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1)
+    return None
+
+def _jpeg_size(file):
+    """Skip from segment to segment until the frame header"""
+    while True:
+        marker = file.read(1)
+        if not marker:
+            return None
+        if marker != b'\xff':
+            continue
+        while marker == b'\xff':
+            marker = file.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in (0xD9, 0xDA):
+            # end of image, or the pixel data started with no frame header
+            return None
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            continue
+        (length,) = struct.unpack('>H', file.read(2))
+        if code in JPEG_FRAME_MARKERS:
+            height, width = struct.unpack('>xHH', file.read(5))
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+class ImageSizes:
+    """
+    The (width, height) of every image by site URL, used to give img tags
+    their intrinsic size, so the layout does not shift as images arrive,
+    and loading hints. path is where the sizes were saved, as JSON, and
+    stands for them among a page's inputs
+    """
+    def __init__(self, sizes=None, path=None):
+        self.sizes = sizes if sizes is not None else {}
+        self.path = path
+
+    def size(self, url):
+        return self.sizes.get(url)
+
+    def hint_fragments(self, fragments, base_url='/'):
+        """
+        Yield the HTML fragments of a page served from base_url with width
+        and height added to every img tag of known size, relative sources
+        resolved against base_url. The first image on a page is likely in
+        view, so it is fetched eagerly at high priority; the rest load lazily
+        """
+        first = True
+
+        def hint(match):
+            nonlocal first
+            tag = self._hint_tag(match.group(0), first, base_url)
+            first = False
+            return tag
+
+        for fragment in fragments:
+            yield IMG_TAG_PATTERN.sub(hint, fragment) if '<img' in fragment else fragment
+
+    def hint_html(self, html, base_url='/'):
+        return ''.join(self.hint_fragments((html,), base_url))
+
+    def _hint_tag(self, tag, first, base_url):
+        attributes = []
+        src = IMG_SRC_PATTERN.search(tag)
+        url = resolve(src.group(1), base_url) if src else None
+        size = self.sizes.get(url) if url is not None else None
+        if size is not None:
+            attributes += [('width', size[0]), ('height', size[1])]
+        if first:
+            attributes += [('loading', 'eager'), ('fetchpriority', 'high')]
+        else:
+            attributes.append(('loading', 'lazy'))
+        attributes.append(('decoding', 'async'))
+
+        end = -2 if tag.endswith('/>') else -1
+        added = ''.join(f' {name}="{value}"' for name, value in attributes
+                        if not re.search(rf'\s{name}\s*=', tag))
+        return tag[:end].rstrip() + added + tag[end:]
+
+    def to_json(self):
+        return json.dumps(self.sizes, indent=1, sort_keys=True) + '\n'
+
+    def digest(self):
+        return hash_bytes(self.to_json().encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as file:
+            return cls({url: tuple(size) for url, size in json.load(file).items()}, path)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ImageSizes) and self.sizes == other.sizes
+
+    def __repr__(self) -> str:
+        return f'ImageSizes({len(self.sizes)} images)'
+
+
+def probe_images(src, path, manifest_path=None, ignore=DEFAULT_IGNORE, asset_map=None, manifest=None):
+    """
+    Read the size of every image under src into an ImageSizes saved at
+    path, by site URL, or by fingerprinted URL with an assets.AssetMap.
+    With a manifest_path, sizes are cached by content hash and a file of
+    unchanged size and mtime is not read at all, so a repeat build probes
+    nothing; a BuildManifest given as manifest is used instead and left
+    to the caller to save. Returns the ImageSizes and whether the saved
+    sizes changed
+    """
+    save = manifest is None
+    manifest = load_manifest(manifest_path, manifest)
+    known = manifest.image_sizes if manifest is not None else {}
+    by_hash = {cached[2]: cached[3:] for cached in known.values()}
+    probed = {}
+    image_sizes = ImageSizes(path=path)
+    for rel_path, entry in walk_files(src, ignore):
+        if not rel_path.endswith(IMAGE_SUFFIXES):
+            continue
+        stat = entry.stat()
+        cached = known.get(entry.path)
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            digest, size = cached[2], cached[3:]
+        else:
+            digest = hash_file(entry.path)
+            size = by_hash.get(digest) or list(image_size(entry.path) or ())
+        probed[entry.path] = [stat.st_size, stat.st_mtime_ns, digest, *size]
+        if size:
+            url = '/' + rel_path
+            image_sizes.sizes[asset_map.url(url) if asset_map is not None else url] = tuple(size)
+
+    changed = write_page(path, image_sizes.to_json())
+    if manifest is not None:
+        manifest.image_sizes = probed
+        if save:
+            manifest.save()
+    return image_sizes, changed
@@ -0,0 +1,155 @@
+import json
+import os
+from assets import ASSET_MANIFEST_NAME, HTML_URL_PATTERN, AssetMap, resolve
+from build_manifest import PARSER_SOURCES, hash_file, load_manifest, sources_version
+from search import page_url
+from site_generation import find_pages
+from textnode_enhancements import INLINE_PATTERN, LineBlockScanner
+from walker import DEFAULT_IGNORE, walk_files
+
+# the links kept by check_links are extracted by the parser and by this module
+LINK_SOURCES = PARSER_SOURCES + ('links.py',)
+
+
+def build_routes(dest_dir_path):
+    """
+    Return the set of every URL the built site answers: each file under
+    dest_dir_path, and each directory holding an index.html, with and
+    without its trailing slash
+    """
+    routes = set()
+    for rel_path, _ in walk_files(dest_dir_path, ()):
+        url = '/' + rel_path
+        routes.add(url)
+        if url.endswith('/index.html'):
+            directory = url[:-len('index.html')]
+            routes.add(directory)
+            routes.add(directory.rstrip('/') or '/')
+    return routes
+
+def markdown_links(lines):
+    """
+    Yield (line number, url) for every link and image in markdown lines,
+    found by the same blocks and inline tokenizer the renderer uses, so
+    code and the text of bold and italic spans are skipped
+    """
+    for block in LineBlockScanner(lines):
+        if block.block_type == 'code' or '](' not in block.text:
+            continue
+        # list items are tokenized one by one, every other block as a whole
+        runs = block.text.split('\n') if block.items is not None else [block.text]
+        line = block.line
+        for run in runs:
+            for match in INLINE_PATTERN.finditer(run):
+                index = match.lastindex
+                if index == 2 or index == 4:
+                    yield line + run.count('\n', 0, match.start()), match[index].strip()
+            line += run.count('\n') + 1
+
+def html_links(lines):
+    """Yield (line number, url) for every href and src attribute in HTML lines"""
+    for number, line in enumerate(lines, 1):
+        for match in HTML_URL_PATTERN.finditer(line):
+            yield number, match.group(2)
+
+
+class BrokenLink:
+    def __init__(self, source, line, url):
+        self.source = source
+        self.line = line
+        self.url = url
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, BrokenLink) and
+                (self.source, self.line, self.url) == (other.source, other.line, other.url))
+
+    def __repr__(self) -> str:
+        return f'BrokenLink({self.source}:{self.line}, {self.url})'
+
+    def __str__(self) -> str:
+        return f'{self.source}:{self.line}: broken link {self.url}'
+
+
+class LinkReport:
+    def __init__(self):
+        self.checked = 0
+        self.scanned = []
+        self.broken = []
+
+    def summary(self):
+        lines = [str(link) for link in self.broken]
+        lines.append(f'links: {self.checked} internal links checked, {len(self.broken)} broken, '
+                     f'{len(self.scanned)} pages scanned')
+        return '\n'.join(lines)
+
+
+def load_links(links_path, version):
+    try:
+        with open(links_path, 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != version:
+        return {}
+    return data.get('pages', {})
+
+def check_links(dir_path_content, dest_dir_path, template_path=None, links_path=None, manifest_path=None,
+                ignore=DEFAULT_IGNORE, manifest=None):
+    """
+    Check every internal link and image of the pages under
+    dir_path_content, and every href and src of the template, against
+    the files built into dest_dir_path. With an asset-manifest.json there,
+    each URL is checked as the fingerprinting build wrote it into the page.
+    With a links_path, the links of every page are kept there by source
+    hash, so only new and changed pages are read; with a manifest_path,
+    or the BuildManifest the build has loaded already, the hashes it
+    computed are reused. Returns a LinkReport
+    listing the broken links by source file and line
+    """
+    report = LinkReport()
+    routes = build_routes(dest_dir_path)
+    asset_map_path = os.path.join(dest_dir_path, ASSET_MANIFEST_NAME)
+    asset_map = AssetMap.load(asset_map_path) if os.path.isfile(asset_map_path) else AssetMap()
+    version = sources_version(LINK_SOURCES)
+    known = load_links(links_path, version) if links_path else {}
+    manifest = load_manifest(manifest_path, manifest)
+
+    def check(source, base_url, links, rewrite_base):
+        for line, url in links:
+            path = resolve(asset_map.url(url, rewrite_base), base_url)
+            if path is None:
+                continue
+            report.checked += 1
+            if path not in routes:
+                report.broken.append(BrokenLink(source, line, url))
+
+    if template_path is not None:
+        with open(template_path, 'r') as file:
+            # the template is filled in at every page, so its relative links are taken from the root;
+            # the build rewrote only its root-relative URLs (see AssetMap.rewrite_html)
+            check(template_path, '/', list(html_links(file)), None)
+
+    pages = {}
+    for src_path, dst_path in find_pages(dir_path_content, dest_dir_path, ignore):
+        entry = manifest.pages.get(src_path) if manifest is not None else None
+        source_hash = entry['deps'].get(src_path) if entry is not None and entry.get('deps') else None
+        if source_hash is None:
+            source_hash = hash_file(src_path)
+        cached = known.get(src_path)
+        if cached is not None and cached['hash'] == source_hash:
+            links = cached['links']
+        else:
+            with open(src_path, 'r') as file:
+                links = [list(link) for link in markdown_links(file)]
+            report.scanned.append(src_path)
+        pages[src_path] = {'hash': source_hash, 'links': links}
+        base_url = page_url(dst_path, dest_dir_path)
+        check(src_path, base_url, links, base_url)
+
+    if links_path:
+        os.makedirs(os.path.dirname(links_path) or '.', exist_ok=True)
+        tmp_path = links_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'version': version, 'pages': pages}, file, separators=(',', ':'))
+        os.replace(tmp_path, links_path)
+    return report
@@ -1,17 +1,301 @@
-from site_generation import copy_dir, generate_pages_recursive
-from textnode_enhancements import extract_markdown_images
+import argparse
+import os
+import sys
+from assets import ASSET_MANIFEST_NAME
+from block_cache import BlockCache
+from compress import DEFAULT_LEVEL, DEFAULT_MIN_SIZE, compress_tree, remove_sidecars
+from images import probe_images
+from links import check_links
+from build_manifest import BuildManifest, generator_version, parser_version
+from daemon import DEFAULT_MAX_CONCURRENT, DEFAULT_SOCKET_PATH, DEFAULT_TIMEOUT, BuildDaemon, PageRenderer, run_daemon
+from page_cache import PageCache
+from profiling import BuildProfiler
+from search import SEARCH_DIR, update_search_index
+from shards import MergeError, merge_shards, parse_shard, shard_path
+from site_generation import BuildError, generate_pages_recursive, sync_dir, why_rebuilt
+from walker import DEFAULT_IGNORE
 
+STATIC_DIR = 'static'
+CONTENT_DIR = 'content'
+TEMPLATE_PATH = 'template.html'
+PUBLIC_DIR = 'public'
+MANIFEST_PATH = os.path.join('.ssg-cache', 'manifest.json')
+PROFILE_DIR = os.path.join('.ssg-cache', 'profile')
+BLOCK_CACHE_PATH = os.path.join('.ssg-cache', 'blocks.pickle')
+PAGE_CACHE_DIR = os.path.join('.ssg-cache', 'pages')
+IMAGE_SIZES_PATH = os.path.join('.ssg-cache', 'image-sizes.json')
+SEARCH_TERMS_PATH = os.path.join('.ssg-cache', 'search-terms.json')
+LINKS_PATH = os.path.join('.ssg-cache', 'links.json')
 
 
-def main():
-    source_dir = 'static'
-    destination_dir = 'public'
-    content_dir = 'content'
-    tmplt = 'template.html'
-    file_dst = 'public'
-    #testing new name
-    copy_dir(source_dir, destination_dir)
-    generate_pages_recursive(content_dir, tmplt, file_dst)
+def add_build_options(parser, suppress=False):
+    # subcommands suppress their defaults so they don't override options
+    # given before the subcommand name
+    default = (lambda value: argparse.SUPPRESS) if suppress else (lambda value: value)
+    parser.add_argument('--jobs', '-j', type=int, default=default(1),
+                        help='render pages in N worker processes (0 = one per CPU)')
+    parser.add_argument('--async-io', action='store_true', default=default(False),
+                        help='overlap reading, rendering and writing pages (helps on slow or network disks)')
+    parser.add_argument('--ignore', action='append', default=default([]), metavar='PATTERN',
+                        help='skip content and static files matching this glob, e.g. "_drafts" or '
+                             '"blog/*.tmp.md" (repeatable; VCS and editor files are always skipped)')
+    parser.add_argument('--shard', type=shard_argument, default=default(None), metavar='I/N',
+                        help=f'build only shard I of N of the pages, into {shard_path(PUBLIC_DIR, (0, 2))}-style '
+                             f'directories for the merge command to combine')
+    parser.add_argument('--checksum', action='store_true', default=default(False),
+                        help='compare static files by content hash instead of mtime')
+    parser.add_argument('--fingerprint', action='store_true', default=default(False),
+                        help='copy stylesheets, scripts, images and fonts under content-hashed names and '
+                             'point the template and markdown images at them')
+    parser.add_argument('--no-image-hints', dest='image_hints', action='store_false', default=default(True),
+                        help='leave out the width, height and lazy-loading attributes of images')
+    parser.add_argument('--search', action='store_true', default=default(False),
+                        help=f'write a sharded search index of the pages to {PUBLIC_DIR}/{SEARCH_DIR}/')
+    parser.add_argument('--check-links', action='store_true', default=default(False),
+                        help='report internal links and images that point at no generated page or asset')
+    parser.add_argument('--fail-on-broken-links', action='store_true', default=default(False),
+                        help='check links and fail the build if any is broken')
+    parser.add_argument('--gzip', action='store_true', default=default(False),
+                        help='write a .gz copy next to every HTML, CSS and other text output')
+    parser.add_argument('--gzip-level', type=int, default=default(DEFAULT_LEVEL), choices=range(1, 10),
+                        metavar='1-9', help=f'gzip compression level (default {DEFAULT_LEVEL})')
+    parser.add_argument('--gzip-min-size', type=int, default=default(DEFAULT_MIN_SIZE), metavar='BYTES',
+                        help=f'leave files smaller than this uncompressed (default {DEFAULT_MIN_SIZE})')
+    parser.add_argument('--profile', action='store_true', default=default(False),
+                        help=f'time every stage of every page (renders serially) and write '
+                             f'a Chrome trace to {PROFILE_DIR}')
+    parser.add_argument('--profile-top', type=int, default=default(10), metavar='N',
+                        help='number of slowest pages to list with --profile')
+    parser.add_argument('--cprofile-page', default=default(None), metavar='PATH',
+                        help='with --profile, dump cProfile stats for rendering this markdown file')
+    parser.add_argument('--block-cache', type=int, default=default(10000), metavar='N',
+                        help='keep the HTML of up to N recently rendered blocks for reuse (0 = off)')
+    parser.add_argument('--persist-block-cache', action='store_true', default=default(False),
+                        help=f'load and save the block cache in {BLOCK_CACHE_PATH}')
+    parser.add_argument('--page-cache-size', type=int, default=default(256), metavar='MB',
+                        help=f'keep up to MB megabytes of parsed pages in {PAGE_CACHE_DIR} '
+                             f'so unchanged markdown is not parsed again (0 = off)')
 
+def shard_argument(text):
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-main()
\ No newline at end of file
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Build the static site from content/ and static/')
+    add_build_options(parser)
+    parser.set_defaults(command='build')
+    commands = parser.add_subparsers(dest='command')
+
+    build_parser = commands.add_parser('build', help='build the site once (default)')
+    add_build_options(build_parser, suppress=True)
+
+    serve_parser = commands.add_parser('serve', help='build, then serve public/ over HTTP')
+    add_build_options(serve_parser, suppress=True)
+    serve_parser.add_argument('--port', type=int, default=8888)
+    serve_parser.add_argument('--watch', action='store_true',
+                              help='rebuild on changes and live-reload open pages')
+    serve_parser.add_argument('--interval', type=float, default=0.5,
+                              help='seconds between checks for changes')
+
+    daemon_parser = commands.add_parser('daemon', help='keep the generator running and take build and render '
+                                                       'requests over a Unix socket')
+    add_build_options(daemon_parser, suppress=True)
+    daemon_parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='path of the socket to listen on')
+    daemon_parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT, metavar='N',
+                               help='requests handled at once; later ones wait for a turn')
+    daemon_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, metavar='SECONDS',
+                               help='longest a request may wait for its turn or run before failing')
+
+    merge_parser = commands.add_parser('merge', help='combine the outputs of a sharded build into public/')
+    add_build_options(merge_parser, suppress=True)
+    merge_parser.add_argument('shards', type=int, help='the number of shards the site was built in')
+
+    why_parser = commands.add_parser('why-rebuilt', help='explain why a page was last rebuilt')
+    why_parser.add_argument('page', help='markdown source or generated HTML path of the page')
+    return parser.parse_args(argv)
+
+def make_block_cache(args):
+    if args.block_cache <= 0:
+        return None
+    if args.persist_block_cache:
+        return BlockCache.load(BLOCK_CACHE_PATH, generator_version(), args.block_cache)
+    return BlockCache(args.block_cache)
+
+def make_page_cache(args):
+    if args.page_cache_size <= 0:
+        return None
+    return PageCache(PAGE_CACHE_DIR, parser_version(), args.page_cache_size * 1024 * 1024)
+
+def ignore_patterns(args):
+    return DEFAULT_IGNORE + tuple(args.ignore)
+
+def build(args, block_cache=None, changed_paths=None):
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    public_dir, manifest_path = PUBLIC_DIR, MANIFEST_PATH
+    if args.shard is not None:
+        public_dir, manifest_path = shard_path(PUBLIC_DIR, args.shard), shard_path(MANIFEST_PATH, args.shard)
+    # every step records into one manifest, saved once the build is over
+    manifest = BuildManifest.load(manifest_path)
+    # public/ is updated in place so unchanged pages and assets are skipped
+    sync_report = sync_dir(STATIC_DIR, public_dir, checksum=args.checksum, ignore=ignore_patterns(args),
+                           fingerprint=args.fingerprint, manifest=manifest)
+    print(sync_report.summary())
+    if sync_report.asset_map_changed and changed_paths is not None:
+        # pages depend on the asset map, which the watcher does not see change
+        changed_paths = list(changed_paths) + [sync_report.asset_map.path]
+    image_sizes = None
+    if args.image_hints:
+        image_sizes, sizes_changed = probe_images(STATIC_DIR, IMAGE_SIZES_PATH, ignore=ignore_patterns(args),
+                                                  asset_map=sync_report.asset_map, manifest=manifest)
+        if sizes_changed and changed_paths is not None:
+            changed_paths = list(changed_paths) + [image_sizes.path]
+    profiler = None
+    if args.profile:
+        profiler = BuildProfiler(args.cprofile_page, os.path.join(PROFILE_DIR, 'page.prof'))
+    try:
+        report = generate_pages_recursive(CONTENT_DIR, TEMPLATE_PATH, public_dir, jobs=jobs,
+                                          profiler=profiler, block_cache=block_cache,
+                                          page_cache=make_page_cache(args), changed_paths=changed_paths,
+                                          async_io=args.async_io, ignore=ignore_patterns(args),
+                                          asset_map=sync_report.asset_map, image_sizes=image_sizes,
+                                          shard=args.shard, collect_terms=args.search and args.shard is None,
+                                          manifest=manifest)
+    except BuildError as e:
+        # the pages that did build are recorded all the same
+        manifest.save()
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if profiler is not None:
+            write_profile(profiler, args.profile_top)
+    print(report.summary())
+    status = 0
+    if args.shard is None:
+        # a sharded build has only some of the pages; merge checks, indexes and compresses the whole site
+        status = finish_site(args, report.terms, manifest)
+    manifest.save()
+    if block_cache is not None:
+        print(block_cache.summary())
+        if args.persist_block_cache:
+            block_cache.save(BLOCK_CACHE_PATH, generator_version())
+    return status
+
+def finish_site(args, terms=None, manifest=None):
+    """
+    Check the links of a complete public/ and write its search index and
+    gzip sidecars, as asked. terms are the search terms the build counted
+    (see BuildReport.terms), and manifest the BuildManifest it recorded
+    into, which the caller saves; without one MANIFEST_PATH is used.
+    Returns 1 if broken links fail the build
+    """
+    status = 0
+    if args.check_links or args.fail_on_broken_links:
+        link_report = check_links(CONTENT_DIR, PUBLIC_DIR, TEMPLATE_PATH, LINKS_PATH, MANIFEST_PATH,
+                                  ignore_patterns(args), manifest)
+        print(link_report.summary())
+        if link_report.broken and args.fail_on_broken_links:
+            status = 1
+    if args.search:
+        search_report = update_search_index(CONTENT_DIR, PUBLIC_DIR, SEARCH_TERMS_PATH, MANIFEST_PATH,
+                                            ignore_patterns(args), terms, manifest)
+        print(search_report.summary())
+    if args.gzip:
+        compress_report = compress_tree(PUBLIC_DIR, MANIFEST_PATH, args.gzip_level, args.gzip_min_size,
+                                        manifest=manifest)
+        print(compress_report.summary())
+    else:
+        shared = manifest is not None
+        manifest = manifest if shared else BuildManifest.load(MANIFEST_PATH)
+        if manifest.sidecars:
+            print(remove_sidecars(PUBLIC_DIR, manifest).summary())
+            if not shared:
+                manifest.save()
+    return status
+
+def merge_site(args):
+    if args.shards < 1:
+        print('the number of shards must be at least 1', file=sys.stderr)
+        return 1
+    shards = [(shard_path(PUBLIC_DIR, (index, args.shards)), shard_path(MANIFEST_PATH, (index, args.shards)))
+              for index in range(args.shards)]
+    try:
+        report = merge_shards(shards, PUBLIC_DIR, MANIFEST_PATH)
+    except MergeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(report.summary())
+    manifest = BuildManifest.load(MANIFEST_PATH)
+    status = finish_site(args, manifest=manifest)
+    manifest.save()
+    return status
+
+def write_profile(profiler, top):
+    trace_path = os.path.join(PROFILE_DIR, 'trace.json')
+    profiler.write_trace(trace_path)
+    print(f'Slowest pages:\n{profiler.report(top)}')
+    print(f'Trace written to {trace_path}')
+    if profiler.cprofile_page is not None and os.path.exists(profiler.cprofile_path):
+        print(f'cProfile stats for {profiler.cprofile_page} written to {profiler.cprofile_path}')
+
+def serve_site(args):
+    from serve import serve
+
+    # one block cache for the life of the server, shared by every rebuild
+    block_cache = make_block_cache(args)
+    status = build(args, block_cache)
+    rebuild = None
+    if args.watch:
+        rebuild = lambda changes: build(args, block_cache, changes) == 0
+    elif status != 0:
+        return status
+    serve(PUBLIC_DIR, args.port, rebuild, (CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH), args.interval,
+          ignore_patterns(args))
+    return 0
+
+def run_build_daemon(args):
+    # builds and renders each keep their own warm block cache, as neither is thread-safe
+    block_cache = make_block_cache(args)
+    render_cache = make_block_cache(args)
+    renderer = PageRenderer(TEMPLATE_PATH, render_cache, make_page_cache(args),
+                            os.path.join(PUBLIC_DIR, ASSET_MANIFEST_NAME) if args.fingerprint else None,
+                            IMAGE_SIZES_PATH if args.image_hints else None)
+
+    def cache_stats():
+        caches = {}
+        if block_cache is not None:
+            caches['build_blocks'] = block_cache.stats()
+        if render_cache is not None:
+            caches['render_blocks'] = render_cache.stats()
+        return caches
+
+    daemon = BuildDaemon(lambda paths: build(args, block_cache, paths), renderer, args.max_concurrent,
+                         args.timeout, cache_stats)
+    try:
+        run_daemon(daemon, args.socket)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'serve':
+        return serve_site(args)
+    if args.command == 'merge':
+        return merge_site(args)
+    if args.command == 'daemon':
+        return run_build_daemon(args)
+    if args.command == 'why-rebuilt':
+        try:
+            print(why_rebuilt(MANIFEST_PATH, args.page))
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+    return build(args, make_block_cache(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import os
+import pickle
+import shutil
+import zlib
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PageCache:
+    """
+    On-disk cache of parsed pages: the title and body HTML of every
+    markdown source, and the search terms counted from the body when a
+    build asked for them, keyed by the hash of its text. Entries live in a
+    directory per parser version, one compressed file each, so worker
+    processes can read and add entries without coordinating. Instances
+    are plain data and can be pickled into worker processes
+    """
+    def __init__(self, root, version, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.version = version
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(root, version[:16])
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """
+        Return (title, body_html, terms) for the page text hashed to key,
+        or None. terms is a Counter, or None if none were stored
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as file:
+                title, body, terms = pickle.loads(zlib.decompress(file.read()))
+            # the mtime doubles as the last use for eviction
+            os.utime(path)
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+        return title, body, terms
+
+    def put(self, key, title, body, terms=None):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(zlib.compress(pickle.dumps((title, body, terms), protocol=pickle.HIGHEST_PROTOCOL)))
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        """Return (mtime, size, path) for every entry of this version"""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return found
+
+    def trim(self):
+        """
+        Delete the entries of other parser versions, then the least
+        recently used entries until the cache fits in max_bytes.
+        Returns the number of entries removed
+        """
+        removed = 0
+        if os.path.isdir(self.root):
+            for entry in os.scandir(self.root):
+                if entry.is_dir() and entry.path != self.directory:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
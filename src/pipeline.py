@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from site_generation import (_init_worker, _render_text_job, _stream_job, is_large, render_markdown, stream_page,
+                             write_page)
+
+# pages allowed in flight between two stages; bounds memory on big sites
+DEFAULT_QUEUE_SIZE = 32
+# reads and writes are I/O bound, so several can wait on the disk at once
+IO_THREADS = 8
+
+
+def read_text(path):
+    """Return the text of the markdown at path, or None if it is to be streamed"""
+    if is_large(path):
+        return None
+    with open(path, 'r') as file:
+        return file.read()
+
+async def _call(executor, func, *args):
+    """Run func in executor, returning (result, error) instead of raising"""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+async def _done(result, error=None):
+    return result, error
+
+async def _read_stage(pages, io_pool, read_queue):
+    for src_path, _ in pages:
+        await read_queue.put(asyncio.ensure_future(_call(io_pool, read_text, src_path)))
+    await read_queue.put(None)
+
+async def _render_stage(pages, render_pool, render, stream, read_queue, render_queue):
+    for src_path, dst_path in pages:
+        text, error = await (await read_queue.get())
+        if error is not None:
+            future = _done(None, error)
+        elif text is None:
+            # a large page is rendered and written in one go, block by block
+            future = _call(render_pool, stream, src_path, dst_path)
+        else:
+            future = _call(render_pool, render, text, src_path)
+        await render_queue.put(asyncio.ensure_future(future))
+    await read_queue.get()
+    await render_queue.put(None)
+
+async def _write_stage(pages, io_pool, render_queue, write_queue, terms):
+    for src_path, dst_path in pages:
+        result, error = await (await render_queue.get())
+        page = None
+        if error is None:
+            page, page_terms = result
+            if terms is not None:
+                terms[src_path] = page_terms
+        if isinstance(page, str):
+            await write_queue.put(asyncio.ensure_future(_call(io_pool, write_page, dst_path, page)))
+        else:
+            # failed, or streamed to its output already (page is then whether it was written)
+            await write_queue.put(asyncio.ensure_future(_done(page, error)))
+    await render_queue.get()
+    await write_queue.put(None)
+
+async def _collect(write_queue):
+    results = []
+    while (write := await write_queue.get()) is not None:
+        results.append(await write)
+    return results
+
+async def build_pages(pages, options, jobs=1, queue_size=DEFAULT_QUEUE_SIZE, io_threads=IO_THREADS, terms=None):
+    """
+    Read, render and write every (src_path, dst_path) in pages with the
+    site_generation.RenderOptions, as three overlapping stages joined by
+    bounded queues: while one page renders, the next ones are being read
+    and the previous ones written. A full queue stalls the stage feeding
+    it, so at most about queue_size pages wait between any two stages.
+    Rendering runs in a process pool when jobs > 1, otherwise in one
+    thread beside the event loop; pages of STREAM_MIN_BYTES or more are
+    streamed from source to output there instead of passing through the
+    queues. Returns (written, error) for every page in page order:
+    whether its output changed (see site_generation.write_page), or the
+    error that stopped it. With options.collect_terms, a terms dict is
+    given the terms.PageTerms counted while rendering each page, by
+    source path
+    """
+    read_queue = asyncio.Queue(queue_size)
+    render_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+
+    if jobs is not None and jobs > 1:
+        render_pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(options,))
+        render = _render_text_job
+        stream = _stream_job
+    else:
+        # one thread keeps the block cache single-threaded
+        render_pool = ThreadPoolExecutor(max_workers=1)
+
+        # both return what they made and the terms.PageTerms counted, like the worker jobs
+        def render(text, src_path):
+            page_terms = options.new_terms()
+            return ''.join(render_markdown(text, options, src_path, page_terms)), page_terms
+
+        def stream(src_path, dst_path):
+            page_terms = options.new_terms()
+            return write_page(dst_path, stream_page(src_path, options, page_terms)), page_terms
+
+    with ThreadPoolExecutor(max_workers=io_threads) as io_pool, render_pool:
+        _, _, _, results = await asyncio.gather(
+            _read_stage(pages, io_pool, read_queue),
+            _render_stage(pages, render_pool, render, stream, read_queue, render_queue),
+            _write_stage(pages, io_pool, render_queue, write_queue, terms),
+            _collect(write_queue),
+        )
+    return results
+
+def run_pipeline(pages, options, jobs=1, queue_size=DEFAULT_QUEUE_SIZE, terms=None):
+    """Run build_pages to completion from synchronous code"""
+    return asyncio.run(build_pages(pages, options, jobs, queue_size, terms=terms))
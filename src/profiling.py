@@ -0,0 +1,75 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ('read', 'parse', 'serialize', 'template', 'write')
+
+
+class BuildProfiler:
+    """
+    Collect per-page, per-stage timings during a build. The events are
+    written in Chrome trace-event format (load the file in chrome://tracing
+    or Perfetto) and summed per page for a slowest-pages report
+    """
+    def __init__(self, cprofile_page=None, cprofile_path=None):
+        self.events = []
+        self.page_stages = {}
+        self.cprofile_page = os.path.normpath(cprofile_page) if cprofile_page else None
+        self.cprofile_path = cprofile_path
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, page, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append({
+                'name': name,
+                'cat': 'page',
+                'ph': 'X',
+                'ts': round((start - self.started) * 1e6, 3),
+                'dur': round((end - start) * 1e6, 3),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': {'page': page},
+            })
+            stages = self.page_stages.setdefault(page, {})
+            stages[name] = stages.get(name, 0.0) + (end - start)
+
+    @contextmanager
+    def page(self, page):
+        """Run cProfile around the page if it is the one asked for"""
+        if self.cprofile_page is None or os.path.normpath(page) != self.cprofile_page:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            os.makedirs(os.path.dirname(self.cprofile_path) or '.', exist_ok=True)
+            profile.dump_stats(self.cprofile_path)
+
+    def write_trace(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, file)
+
+    def slowest(self, count=10):
+        """Return (page, total seconds, {stage: seconds}) for the slowest pages"""
+        totals = [(page, sum(stages.values()), stages) for page, stages in self.page_stages.items()]
+        totals.sort(key=lambda item: (-item[1], item[0]))
+        return totals[:count]
+
+    def report(self, count=10):
+        lines = [f"{'total ms':>9} " + ' '.join(f'{name:>9}' for name in STAGES) + '  page']
+        for page, total, stages in self.slowest(count):
+            cells = ' '.join(f'{stages.get(name, 0.0) * 1000:>9.2f}' for name in STAGES)
+            lines.append(f'{total * 1000:>9.2f} {cells}  {page}')
+        return '\n'.join(lines)
@@ -0,0 +1,134 @@
+import json
+import os
+from build_manifest import hash_file, load_manifest, parser_version
+from site_generation import find_pages, write_page
+from terms import PageTerms
+from textnode_enhancements import LineBlockScanner, cached_block_node, find_title_in_lines
+from walker import DEFAULT_IGNORE
+
+SEARCH_DIR = 'search'
+SEARCH_FORMAT = 1
+# terms are sharded by their first characters, so a query word costs one small download
+SHARD_PREFIX_LENGTH = 2
+
+
+def page_terms(path):
+    """
+    Return the title of the markdown page at path and a Counter of the
+    terms in its text, for pages the build did not render: the body is
+    parsed one block at a time and counted as render_page counts it
+    """
+    terms = PageTerms()
+    with open(path, 'r') as file:
+        terms.title = find_title_in_lines(file)
+    with open(path, 'r') as file:
+        for block in LineBlockScanner(file):
+            cached_block_node(block, counts=terms.counts)
+    return terms.title, terms.counts
+
+def page_url(html_path, dest_dir_path):
+    """The site URL of a generated page: public/blog/index.html -> /blog/"""
+    url = '/' + os.path.relpath(html_path, dest_dir_path).replace(os.sep, '/')
+    return url[:-len('index.html')] if url.endswith('/index.html') else url
+
+def shard_name(term):
+    return term[:SHARD_PREFIX_LENGTH]
+
+
+class SearchReport:
+    def __init__(self):
+        self.tokenized = []
+        self.unchanged = []
+        self.removed = []
+        self.shards = 0
+
+    def summary(self):
+        return (f'search index: {len(self.tokenized)} pages tokenized, {len(self.unchanged)} unchanged, '
+                f'{len(self.removed)} removed, {self.shards} shards')
+
+
+def load_terms(terms_path, version):
+    try:
+        with open(terms_path, 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != version:
+        return {}
+    return data.get('pages', {})
+
+def update_search_index(dir_path_content, dest_dir_path, terms_path, manifest_path=None, ignore=DEFAULT_IGNORE,
+                        rendered=None, manifest=None):
+    """
+    Write a client-side search index of the pages under dir_path_content
+    to dest_dir_path/SEARCH_DIR without reading any generated HTML.
+    index.json lists the pages as [url, title], in id order, and the shard
+    prefixes; <prefix>.json maps each term starting with prefix to its
+    postings, a flat [page id, count, page id, count, ...] list, so the
+    browser downloads only the shard of the word it looks up.
+    The terms of every page are kept in terms_path by source hash, so
+    only new and changed pages are tokenized; with a manifest_path, or
+    the BuildManifest the build has loaded already, the hashes computed
+    by the build are reused rather than read again.
+    rendered maps the source paths of the pages just built to the
+    terms.PageTerms counted while rendering them (see BuildReport.terms),
+    which are taken as they are
+    """
+    report = SearchReport()
+    version = parser_version()
+    known = load_terms(terms_path, version)
+    manifest = load_manifest(manifest_path, manifest)
+    pages = {}
+    for src_path, dst_path in find_pages(dir_path_content, dest_dir_path, ignore):
+        entry = manifest.pages.get(src_path) if manifest is not None else None
+        source_hash = entry['deps'].get(src_path) if entry is not None else None
+        if source_hash is None:
+            source_hash = hash_file(src_path)
+        cached = known.get(src_path)
+        if cached is not None and cached['hash'] == source_hash:
+            report.unchanged.append(src_path)
+            pages[src_path] = dict(cached, url=page_url(dst_path, dest_dir_path))
+            continue
+        if rendered is not None and src_path in rendered:
+            title, terms = rendered[src_path].title, rendered[src_path].counts
+        else:
+            title, terms = page_terms(src_path)
+        report.tokenized.append(src_path)
+        pages[src_path] = {'hash': source_hash, 'url': page_url(dst_path, dest_dir_path), 'title': title,
+                           'terms': dict(terms)}
+    report.removed = sorted(known.keys() - pages.keys())
+
+    os.makedirs(os.path.dirname(terms_path) or '.', exist_ok=True)
+    tmp_path = terms_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump({'version': version, 'pages': pages}, file, separators=(',', ':'))
+    os.replace(tmp_path, terms_path)
+
+    report.shards = write_index(sorted(pages.values(), key=lambda page: page['url']),
+                                os.path.join(dest_dir_path, SEARCH_DIR))
+    return report
+
+def write_index(pages, search_dir):
+    """Write the index of pages, in page id order, and remove shards no term needs any more"""
+    shards = {}
+    for page_id, page in enumerate(pages):
+        for term, count in page['terms'].items():
+            shards.setdefault(shard_name(term), {}).setdefault(term, []).extend((page_id, count))
+
+    index = {
+        'format': SEARCH_FORMAT,
+        'prefix_length': SHARD_PREFIX_LENGTH,
+        'pages': [[page['url'], page['title']] for page in pages],
+        'shards': sorted(shards),
+    }
+    write_page(os.path.join(search_dir, 'index.json'), json.dumps(index, separators=(',', ':')))
+    current = {'index.json'}
+    for prefix, postings in shards.items():
+        name = f'{prefix}.json'
+        current.add(name)
+        write_page(os.path.join(search_dir, name), json.dumps(postings, separators=(',', ':'), sort_keys=True))
+
+    for entry in os.scandir(search_dir):
+        if entry.is_file() and entry.name.endswith('.json') and entry.name not in current:
+            os.remove(entry.path)
+    return len(shards)
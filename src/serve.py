@@ -0,0 +1,164 @@
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from walker import DEFAULT_IGNORE, walk_files
+
+LIVE_RELOAD_PATH = '/__livereload'
+LIVE_RELOAD_SCRIPT = (
+    '<script>new EventSource("' + LIVE_RELOAD_PATH + '")'
+    '.addEventListener("reload", function () { location.reload(); });</script>'
+)
+# comment lines keep idle event streams from being closed by proxies
+KEEPALIVE_SECONDS = 15
+
+
+def snapshot(paths, ignore=DEFAULT_IGNORE):
+    """Map every file under paths that no ignore pattern matches to its (mtime, size)"""
+    state = {}
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+            continue
+        if not os.path.isdir(path):
+            continue
+        for _, entry in walk_files(path, ignore):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            state[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+def changed_paths(before, after):
+    return sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+
+class PollingWatcher:
+    """
+    Detect changes under a set of files and directories by comparing
+    stat snapshots, so watching needs nothing beyond the standard library
+    """
+    def __init__(self, paths, interval=0.5, ignore=DEFAULT_IGNORE):
+        self.paths = paths
+        self.interval = interval
+        self.ignore = ignore
+        self.state = snapshot(paths, ignore)
+
+    def poll(self):
+        current = snapshot(self.paths, self.ignore)
+        changes = changed_paths(self.state, current)
+        self.state = current
+        return changes
+
+    def watch(self, on_change, stop):
+        while not stop.wait(self.interval):
+            changes = self.poll()
+            if changes:
+                on_change(changes)
+
+
+class ReloadBroadcaster:
+    """Counts finished builds and wakes every open event stream on a new one"""
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    broadcaster = None
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            self.stream_events()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        if path.endswith('.html') and os.path.isfile(path) and self.path.endswith(('/', '.html')):
+            self.send_html(path)
+            return
+        super().do_GET()
+
+    def send_html(self, path):
+        with open(path, 'rb') as file:
+            body = file.read()
+        script = LIVE_RELOAD_SCRIPT.encode()
+        index = body.rfind(b'</body>')
+        body = body[:index] + script + body[index:] if index != -1 else body + script
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        version = self.broadcaster.version
+        try:
+            while True:
+                latest = self.broadcaster.wait(version, KEEPALIVE_SECONDS)
+                if latest != version:
+                    version = latest
+                    self.wfile.write(f'event: reload\ndata: {version}\n\n'.encode())
+                else:
+                    self.wfile.write(b': keepalive\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if self.path != LIVE_RELOAD_PATH:
+            super().log_message(format, *args)
+
+
+def serve(directory, port, rebuild=None, watch_paths=(), interval=0.5, ignore=DEFAULT_IGNORE):
+    """
+    Serve directory over HTTP. With a rebuild callable and watch_paths,
+    every change under watch_paths, other than to files matching the
+    ignore patterns, runs rebuild(changed_paths) in this process and,
+    when it returns True, tells open pages to reload
+    """
+    broadcaster = ReloadBroadcaster()
+    handler = functools.partial(LiveReloadHandler, directory=directory)
+    LiveReloadHandler.broadcaster = broadcaster
+    server = ThreadingHTTPServer(('', port), handler)
+    server.daemon_threads = True
+
+    stop = threading.Event()
+    if rebuild is not None and watch_paths:
+        watcher = PollingWatcher(list(watch_paths), interval, ignore)
+
+        def on_change(changes):
+            started = time.perf_counter()
+            print(f'{len(changes)} file(s) changed, rebuilding')
+            if rebuild(changes):
+                print(f'rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms')
+                broadcaster.notify()
+
+        threading.Thread(target=watcher.watch, args=(on_change, stop), daemon=True).start()
+
+    print(f'Serving {directory} on http://localhost:{port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
@@ -0,0 +1,159 @@
+import filecmp
+import os
+from concurrent.futures import ThreadPoolExecutor
+from build_manifest import BuildManifest
+from site_generation import COPY_THREADS, asset_changed, copy_asset, remove_empty_dirs, same_contents
+from walker import walk_files
+
+
+def parse_shard(text):
+    """'2/4' -> (1, 4): shards are numbered from 1 on the command line and from 0 inside"""
+    try:
+        number, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f'expected a shard as i/n, like 1/4, not {text!r}')
+    if not 1 <= number <= count:
+        raise ValueError(f'shard {number} is not between 1 and {count}')
+    return number - 1, count
+
+def shard_path(path, shard):
+    """public -> public.shard-1-of-4, manifest.json -> manifest.shard-1-of-4.json"""
+    base, ext = os.path.splitext(path)
+    return f'{base}.shard-{shard[0] + 1}-of-{shard[1]}{ext}'
+
+
+class MergeError(Exception):
+    def __init__(self, conflicts, missing):
+        self.conflicts = conflicts
+        self.missing = missing
+        lines = [f'cannot merge: {len(conflicts)} conflict(s), {len(missing)} missing page(s)']
+        lines += [f'  conflict: {message}' for message in conflicts]
+        lines += [f'  missing: {path}' for path in missing]
+        super().__init__('\n'.join(lines))
+
+
+class MergeReport:
+    def __init__(self):
+        self.pages = 0
+        self.copied = []
+        self.unchanged = []
+        self.removed = []
+
+    def summary(self):
+        return (f'{self.pages} pages merged, {len(self.copied)} files copied, {len(self.unchanged)} unchanged, '
+                f'{len(self.removed)} removed')
+
+
+def check_shards(manifests):
+    """Return the conflicts that keep the shard manifests from making up one build"""
+    conflicts = []
+    count = len(manifests)
+    for manifest in manifests:
+        if not os.path.isfile(manifest.path):
+            conflicts.append(f'{manifest.path} does not exist')
+        elif manifest.shard is None:
+            conflicts.append(f'{manifest.path} is not the manifest of a sharded build')
+        elif manifest.shard['count'] != count:
+            conflicts.append(f"{manifest.path} is shard {manifest.shard['index'] + 1} of "
+                             f"{manifest.shard['count']}, not of {count}")
+    if conflicts:
+        return conflicts
+
+    indexes = sorted(manifest.shard['index'] for manifest in manifests)
+    if indexes != list(range(count)):
+        conflicts.append(f'expected shards 1 to {count}, found {[index + 1 for index in indexes]}')
+    first = manifests[0]
+    for manifest in manifests[1:]:
+        if manifest.version != first.version:
+            conflicts.append(f'{manifest.path} and {first.path} were built by different generator versions')
+        if manifest.shard['pages'] != first.shard['pages']:
+            conflicts.append(f'{manifest.path} and {first.path} were built from different content')
+    return conflicts
+
+def merge_shards(shards, dest_dir_path, manifest_path=None, threads=COPY_THREADS):
+    """
+    Combine the outputs of a sharded build, given as (output_dir,
+    manifest_path) for every shard, into dest_dir_path. Nothing is copied
+    unless the shards make up one build of the same content: every shard
+    present once, every page built by one of them, and no file written by
+    two shards with different contents; otherwise a MergeError lists every
+    problem. Files already in dest_dir_path with the same contents are
+    left alone. With a manifest_path, the merged manifest is saved there
+    and the files an earlier merge wrote that no shard has now are removed
+    """
+    manifests = [BuildManifest.load(shard_manifest) for _, shard_manifest in shards]
+    conflicts = check_shards(manifests)
+    if conflicts:
+        raise MergeError(conflicts, [])
+
+    missing = []
+    built = {}
+    page_outputs = set()
+    for (output_dir, _), manifest in zip(shards, manifests):
+        for src_path, entry in manifest.pages.items():
+            if src_path in built:
+                conflicts.append(f'{src_path} was built by both {built[src_path]} and {output_dir}')
+            built[src_path] = output_dir
+            if os.path.isfile(entry['output']):
+                page_outputs.add(os.path.normpath(entry['output']))
+            else:
+                missing.append(entry['output'])
+    missing += sorted(set(manifests[0].shard['pages']) - built.keys())
+
+    files = {}
+    for output_dir, _ in shards:
+        for rel_path, entry in walk_files(output_dir, ()):
+            if rel_path in files:
+                if not same_file(files[rel_path], entry.path):
+                    conflicts.append(f'{files[rel_path]} and {entry.path} differ')
+                continue
+            files[rel_path] = entry.path
+    if conflicts or missing:
+        raise MergeError(conflicts, missing)
+
+    report = MergeReport()
+    report.pages = len(built)
+    pairs = [(src_path, os.path.normpath(os.path.join(dest_dir_path, *rel_path.split('/'))))
+             for rel_path, src_path in sorted(files.items())]
+    changed = []
+    for src_path, dst_path in pairs:
+        if asset_changed(src_path, dst_path) and not same_contents(src_path, dst_path):
+            changed.append((src_path, dst_path))
+        else:
+            report.unchanged.append(dst_path)
+    if len(changed) > 1 and threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda pair: copy_asset(*pair), changed))
+    else:
+        for src_path, dst_path in changed:
+            copy_asset(src_path, dst_path)
+    report.copied = [dst_path for _, dst_path in changed]
+
+    if manifest_path:
+        merged = BuildManifest.load(manifest_path)
+        previous = set(merged.assets) | {entry['output'] for entry in merged.pages.values()}
+        merged.version = manifests[0].version
+        merged.pages = {}
+        assets = []
+        for (output_dir, _), manifest in zip(shards, manifests):
+            for src_path, entry in manifest.pages.items():
+                rel_path = os.path.relpath(entry['output'], output_dir)
+                merged.pages[src_path] = dict(entry, output=os.path.normpath(os.path.join(dest_dir_path, rel_path)))
+        for src_path, dst_path in pairs:
+            if os.path.normpath(src_path) not in page_outputs:
+                assets.append(dst_path)
+        merged.assets = assets
+        current = set(assets) | {entry['output'] for entry in merged.pages.values()}
+        for old_path in sorted(previous - current):
+            if os.path.isfile(old_path):
+                os.remove(old_path)
+                report.removed.append(old_path)
+                remove_empty_dirs(os.path.dirname(old_path), dest_dir_path)
+        merged.save()
+    return report
+
+def same_file(path, other_path):
+    try:
+        return os.path.getsize(path) == os.path.getsize(other_path) and filecmp.cmp(path, other_path, shallow=False)
+    except FileNotFoundError:
+        return False
@@ -1,62 +1,698 @@
+import filecmp
 import os
 import shutil
-from textnode_enhancements import extract_title, markdown_to_html_node
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from assets import ASSET_MANIFEST_NAME, FINGERPRINT_SUFFIXES, AssetMap, fingerprinted_path, page_base
+from build_manifest import BuildManifest, generator_version, hash_bytes, hash_file, load_manifest
+from template import load_template
+from terms import PageTerms
+from textnode_enhancements import LineBlockScanner, find_title_in_lines, iter_blocks_html, markdown_to_page
+from walker import DEFAULT_IGNORE, walk_files
 
-def copy_dir(src, dst):
+# below this many pages the cost of starting worker processes outweighs the gain
+PARALLEL_MIN_PAGES = 16
+# copies are I/O bound, so a few threads keep the disk busy
+COPY_THREADS = 8
+# pages at least this large are parsed and written block by block instead of whole
+STREAM_MIN_BYTES = 8 * 1024 * 1024
+
+class SyncReport:
+    def __init__(self):
+        self.copied = []
+        self.unchanged = []
+        self.removed = []
+        # set when fingerprinting: the assets.AssetMap, and whether its JSON changed
+        self.asset_map = None
+        self.asset_map_changed = False
+
+    def summary(self):
+        return (f'{len(self.copied)} assets copied, {len(self.unchanged)} unchanged, '
+                f'{len(self.removed)} removed')
+
+
+def asset_changed(src_path, dst_path, checksum=False):
+    """
+    Compare a source file with its copy by size and mtime, or with
+    checksum by size and content hash
+    """
+    try:
+        dst_stat = os.stat(dst_path)
+    except FileNotFoundError:
+        return True
+    src_stat = os.stat(src_path)
+    if src_stat.st_size != dst_stat.st_size:
+        return True
+    if checksum:
+        return hash_file(src_path) != hash_file(dst_path)
+    return src_stat.st_mtime_ns != dst_stat.st_mtime_ns
+
+def same_contents(src_path, dst_path):
+    """
+    Whether dst_path already holds the bytes of src_path. If so, the
+    source's mtime is carried over so the next sync needs only a stat
+    """
+    try:
+        if not filecmp.cmp(src_path, dst_path, shallow=False):
+            return False
+    except FileNotFoundError:
+        return False
+    shutil.copystat(src_path, dst_path)
+    return True
+
+def copy_asset(src_path, dst_path):
+    """
+    Copy through a temporary file so dst_path never holds a partial file.
+    shutil.copy2 uses the kernel's copy paths (sendfile) where it can and
+    keeps the mtime that asset_changed compares
     """
-    Recursively copy all contentes from src to dst, 
-    ensuring dst is clean
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = f'{dst_path}.{os.getpid()}.tmp'
+    try:
+        shutil.copy2(src_path, tmp_path)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def sync_dir(src, dst, manifest_path=None, checksum=False, threads=COPY_THREADS, ignore=DEFAULT_IGNORE,
+             fingerprint=False, manifest=None):
+    """
+    Bring dst up to date with src without clearing it first: only new or
+    changed files are copied, several at a time. With a manifest_path,
+    files copied by an earlier sync whose source is gone are removed;
+    anything else in dst, like generated pages, is left alone. Files
+    matching the ignore patterns are not copied.
+    With fingerprint, stylesheets, scripts, images and fonts are copied
+    under content-hashed names instead (see fingerprint_assets).
+    A BuildManifest given as manifest is used in place of manifest_path
+    and left to the caller to save
     """
-    if os.path.exists(dst):
-        shutil.rmtree(dst)
+    report = SyncReport()
+    save = manifest is None
+    manifest = load_manifest(manifest_path, manifest)
+    pairs = []
+    stylesheets = []
+    if fingerprint:
+        pairs, stylesheets, report.asset_map = fingerprint_assets(src, dst, manifest, ignore)
+    else:
+        for rel_path, entry in walk_files(src, ignore):
+            pairs.append((entry.path, os.path.normpath(os.path.join(dst, *rel_path.split('/')))))
+
+    changed = []
+    for src_path, dst_path in pairs:
+        if asset_changed(src_path, dst_path, checksum) and not same_contents(src_path, dst_path):
+            changed.append((src_path, dst_path))
+        else:
+            report.unchanged.append(dst_path)
+
+    os.makedirs(dst, exist_ok=True)
+    if len(changed) > 1 and threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda pair: copy_asset(*pair), changed))
+    else:
+        for src_path, dst_path in changed:
+            copy_asset(src_path, dst_path)
+    report.copied = [dst_path for _, dst_path in changed]
 
-    os.mkdir(dst)
+    for dst_path, css in stylesheets:
+        (report.copied if write_page(dst_path, css) else report.unchanged).append(dst_path)
+    if report.asset_map is not None:
+        report.asset_map_changed = write_page(report.asset_map.path, report.asset_map.to_json())
 
-    for item in os.listdir(src):
-        src_path = os.path.join(src, item)
-        dst_path = os.path.join(dst, item)
+    if manifest is not None:
+        current = {dst_path for _, dst_path in pairs} | {dst_path for dst_path, _ in stylesheets}
+        if report.asset_map is not None:
+            current.add(report.asset_map.path)
+        for old_path in manifest.assets:
+            if old_path not in current and os.path.isfile(old_path):
+                os.remove(old_path)
+                report.removed.append(old_path)
+                remove_empty_dirs(os.path.dirname(old_path), dst)
+        manifest.assets = sorted(current)
+        if save:
+            manifest.save()
 
+    return report
 
-        if os.path.isdir(src_path):
-            copy_dir(src_path, dst_path)
+def fingerprint_assets(src, dst, manifest=None, ignore=DEFAULT_IGNORE):
+    """
+    Plan a sync of src into dst where every file with one of the
+    FINGERPRINT_SUFFIXES gets its content hash in its name. Stylesheets
+    have their url() references pointed at the renamed files first, and
+    are hashed as rewritten. Content hashes are kept in the manifest and
+    only recomputed when a file's size or mtime changes.
+    Returns the (src_path, dst_path) pairs to copy, the (dst_path, text)
+    of the rewritten stylesheets, and the AssetMap, to be saved in dst
+    """
+    asset_map = AssetMap(path=os.path.join(dst, ASSET_MANIFEST_NAME))
+    known = manifest.asset_hashes if manifest is not None else {}
+    hashes = {}
+    pairs = []
+    css_files = []
+    for rel_path, entry in walk_files(src, ignore):
+        if not rel_path.endswith(FINGERPRINT_SUFFIXES):
+            pairs.append((entry.path, os.path.normpath(os.path.join(dst, *rel_path.split('/')))))
+        elif rel_path.endswith('.css'):
+            css_files.append((rel_path, entry.path))
         else:
-            shutil.copy(src_path, dst_path)
-            #print(f'Copied {src_path} to {dst_path}')
+            stat = entry.stat()
+            cached = known.get(entry.path)
+            if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                digest = cached[2]
+            else:
+                digest = hash_file(entry.path)
+            hashes[entry.path] = [stat.st_size, stat.st_mtime_ns, digest]
+            hashed = fingerprinted_path(rel_path, digest)
+            asset_map.urls['/' + rel_path] = '/' + hashed
+            pairs.append((entry.path, os.path.normpath(os.path.join(dst, *hashed.split('/')))))
 
-def generate_page(from_path, template_path, dst_path):
-    #print(f'Generating page from {from_path} to {dst_path} using {template_path}')
+    # stylesheets only point at the other assets, so their names do not depend on each other
+    others = AssetMap(dict(asset_map.urls))
+    stylesheets = []
+    for rel_path, src_path in css_files:
+        with open(src_path, 'r') as file:
+            css = others.rewrite_css(file.read(), '/' + rel_path)
+        hashed = fingerprinted_path(rel_path, hash_bytes(css.encode()))
+        asset_map.urls['/' + rel_path] = '/' + hashed
+        stylesheets.append((os.path.normpath(os.path.join(dst, *hashed.split('/'))), css))
+
+    if manifest is not None:
+        manifest.asset_hashes = hashes
+    return pairs, stylesheets, asset_map
+
+def remove_empty_dirs(path, root):
+    """Remove path and its parents while they are empty, stopping at root"""
+    root = os.path.abspath(root)
+    path = os.path.abspath(path)
+    while path != root and path.startswith(root + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
+
+class RenderOptions:
+    """
+    Everything rendering a page needs besides the page itself: the
+    compiled template, a block_cache.BlockCache and page_cache.PageCache,
+    an assets.AssetMap for fingerprinted links, images.ImageSizes for
+    image hints, whether to count search terms, and the content_dir the
+    pages are read from, which gives the URL relative links and images
+    resolve against. Plain data, so it is handed to each worker process once
+    """
+    def __init__(self, template, block_cache=None, page_cache=None, asset_map=None, image_sizes=None,
+                 collect_terms=False, content_dir=None):
+        self.template = template
+        self.block_cache = block_cache
+        self.page_cache = page_cache
+        self.asset_map = asset_map
+        self.image_sizes = image_sizes
+        self.collect_terms = collect_terms
+        self.content_dir = content_dir
+
+    def page_base(self, src_path):
+        """The URL of the directory the page at src_path is served from (see assets.page_base)"""
+        return page_base(src_path, self.content_dir)
+
+    def new_terms(self):
+        """A terms.PageTerms to fill while rendering a page, or None when not counting"""
+        return PageTerms() if self.collect_terms else None
+
+def render_page(from_path, options, profiler=None, terms=None):
+    """
+    Parse the markdown at from_path and return the filled-in template of
+    the RenderOptions as an iterator of HTML fragments. With a profiler
+    every stage is timed and the page is returned as one string, except
+    for a large page, which still streams and is timed as a whole while
+    it is written (see write_pages). With a
+    page_cache.PageCache, the title and body of markdown parsed before
+    are read back instead. With an assets.AssetMap, links and images
+    point at fingerprinted copies, and with an images.ImageSizes they get
+    their size and loading hints. A terms.PageTerms is filled with the
+    title and the search terms of the body as it is rendered, or read
+    back from the page_cache. Pages of STREAM_MIN_BYTES or more are never
+    read whole (see stream_page)
+    """
+    if is_large(from_path):
+        if profiler is not None:
+            return _stream_page_profiled(from_path, options, profiler, terms)
+        return stream_page(from_path, options, terms)
+    if profiler is not None:
+        with profiler.page(from_path):
+            return _render_page_profiled(from_path, options, profiler, terms)
 
     with open(from_path, 'r') as file:
         markdown_text = file.read()
 
-    with open(template_path, 'r') as file:
-        template_text = file.read()
+    return render_markdown(markdown_text, options, from_path, terms)
+
+def render_markdown(markdown_text, options, from_path=None, terms=None):
+    """
+    Fill the template from a page's markdown text, as an iterator of HTML
+    fragments. from_path is where the text was read from, against which
+    relative links and images resolve; without it they resolve from /
+    """
+    asset_map, image_sizes = options.asset_map, options.image_sizes
+    base_url = options.page_base(from_path)
+    if asset_map is not None:
+        markdown_text = asset_map.rewrite_markdown(markdown_text, base_url)
+    if options.page_cache is not None:
+        title, body = parse_cached(markdown_text, options.block_cache, options.page_cache, terms)
+        if image_sizes is not None:
+            body = image_sizes.hint_html(body, base_url)
+        return options.template.iter_render({'Title': title, 'Content': body})
+
+    title, content = markdown_to_page(markdown_text, options.block_cache, _counts(terms))
+    body = content.iter_html()
+    if terms is not None:
+        terms.title = title
+    if image_sizes is not None:
+        body = image_sizes.hint_fragments(body, base_url)
+
+    return options.template.iter_render({'Title': title, 'Content': body})
+
+def _counts(terms):
+    """The Counter of a terms.PageTerms to count the body into, or None when not counting"""
+    return terms.counts if terms is not None else None
+
+def is_large(path):
+    return os.path.getsize(path) >= STREAM_MIN_BYTES
+
+def stream_page(from_path, options, terms=None):
+    """
+    Render a page without holding its markdown or HTML in memory: the
+    title is found by a first pass over the lines, then the file is read
+    again one block at a time as the returned fragments are consumed
+    """
+    with open(from_path, 'r') as file:
+        title = find_title_in_lines(file)
+    if title is None:
+        raise Exception('No Header!')
+    if terms is not None:
+        terms.title = title
+    base_url = options.page_base(from_path)
+    content = _stream_content(from_path, options.block_cache, options.asset_map, base_url, _counts(terms))
+    if options.image_sizes is not None:
+        content = options.image_sizes.hint_fragments(content, base_url)
+    return options.template.iter_render({'Title': title, 'Content': content})
+
+def _stream_content(from_path, block_cache, asset_map, base_url, counts=None):
+    with open(from_path, 'r') as file:
+        lines = file
+        if asset_map is not None:
+            lines = asset_map.rewrite_markdown_lines(file, base_url)
+        yield from iter_blocks_html(LineBlockScanner(lines), block_cache, counts)
+
+def parse_cached(markdown_text, block_cache, page_cache, terms=None):
+    """
+    Return the title and body HTML of markdown_text, parsing it only on a
+    page_cache miss. A terms.PageTerms is filled from the entry too; the
+    page is parsed again if it was stored without terms
+    """
+    key = hash_bytes(markdown_text.encode())
+    cached = page_cache.get(key)
+    if cached is not None:
+        title, body, counts = cached
+        if terms is None:
+            return title, body
+        if counts is not None:
+            terms.title, terms.counts = title, counts
+            return title, body
+    title, content = markdown_to_page(markdown_text, block_cache, _counts(terms))
+    body = content.to_html()
+    if terms is not None:
+        terms.title = title
+    page_cache.put(key, title, body, _counts(terms))
+    return title, body
 
-    title = extract_title(markdown_text)
-    content = markdown_to_html_node(markdown_text).to_html()
+def _stream_page_profiled(from_path, options, profiler, terms):
+    # reading, parsing and rendering happen as the page is written, in the write stage
+    with profiler.page(from_path):
+        yield from stream_page(from_path, options, terms)
 
-    page_text = template_text.replace('{{ Title }}', title).replace('{{ Content }}', content)
+def _render_page_profiled(from_path, options, profiler, terms):
+    block_cache, page_cache = options.block_cache, options.page_cache
+    asset_map, image_sizes = options.asset_map, options.image_sizes
+    base_url = options.page_base(from_path)
+    with profiler.stage(from_path, 'read'):
+        with open(from_path, 'r') as file:
+            markdown_text = file.read()
+    if asset_map is not None:
+        with profiler.stage(from_path, 'parse'):
+            markdown_text = asset_map.rewrite_markdown(markdown_text, base_url)
+    if page_cache is not None:
+        # a hit has nothing left to serialize, so the lookup counts as parsing
+        with profiler.stage(from_path, 'parse'):
+            title, body = parse_cached(markdown_text, block_cache, page_cache, terms)
+    else:
+        with profiler.stage(from_path, 'parse'):
+            title, content = markdown_to_page(markdown_text, block_cache, _counts(terms))
+        with profiler.stage(from_path, 'serialize'):
+            body = content.to_html()
+        if terms is not None:
+            terms.title = title
+    if image_sizes is not None:
+        with profiler.stage(from_path, 'serialize'):
+            body = image_sizes.hint_html(body, base_url)
+    with profiler.stage(from_path, 'template'):
+        return options.template.render({'Title': title, 'Content': body})
+
+def write_page(dst_path, page):
+    """
+    Write a page given as a string or as an iterable of fragments, unless
+    dst_path already holds exactly that text, so unchanged outputs keep
+    their mtime. The fragments are compared with the existing file as
+    they come, and a changed page is written to a temporary file that
+    replaces dst_path in one step. Returns whether the file was written
+    """
+    fragments = iter((page,) if isinstance(page, str) else page)
+    matched = 0
+    pending = None
+    try:
+        with open(dst_path, 'r', newline='') as old:
+            for fragment in fragments:
+                pending = fragment
+                if old.read(len(fragment)) != fragment:
+                    break
+                matched += len(fragment)
+                pending = None
+            else:
+                if not old.read(1):
+                    return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
 
     os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    tmp_path = f'{dst_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            if matched:
+                # the fragments that matched are gone; copy them back from the old file
+                with open(dst_path, 'r', newline='') as old:
+                    while matched:
+                        chunk = old.read(min(matched, 1 << 16))
+                        f.write(chunk)
+                        matched -= len(chunk)
+            if pending is not None:
+                f.write(pending)
+            f.writelines(fragments)
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+def generate_page(from_path, template_path, dst_path):
+    #print(f'Generating page from {from_path} to {dst_path} using {template_path}')
+    write_page(dst_path, render_page(from_path, RenderOptions(load_template(template_path))))
+
+# the RenderOptions of a worker process, set once by _init_worker
+_worker_options = None
+
+def _init_worker(options):
+    global _worker_options
+    _worker_options = options
+
+def _render_job(from_path):
+    """Render a page in a worker, returning (page, error, terms.PageTerms or None)"""
+    terms = _worker_options.new_terms()
+    try:
+        page = render_page(from_path, _worker_options, terms=terms)
+        return ''.join(page), None, terms
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}', None
+
+def _stream_job(from_path, dst_path):
+    """Stream a page to dst_path in a worker, returning (written, terms.PageTerms or None)"""
+    terms = _worker_options.new_terms()
+    return write_page(dst_path, stream_page(from_path, _worker_options, terms)), terms
+
+def _render_text_job(markdown_text, from_path=None):
+    """Render a page's text in a worker, returning (page, terms.PageTerms or None)"""
+    terms = _worker_options.new_terms()
+    return ''.join(render_markdown(markdown_text, _worker_options, from_path, terms)), terms
+
+def render_pages(src_paths, options, jobs=1, profiler=None, terms=None):
+    """
+    Render every page in src_paths with the RenderOptions, yielding
+    (page, error) pairs in the same order. With jobs > 1 the pages are
+    rendered to strings in a process pool, each worker starting from a
+    copy of the block cache and sharing the page cache on disk; small
+    batches, every batch when profiling, and large pages are rendered in
+    this process and the page is a fragment iterator to be streamed out.
+    With options.collect_terms, a terms dict is given the
+    terms.PageTerms of every page rendered, by source path, complete once
+    the page has been consumed
+    """
+    serial = jobs is None or jobs <= 1 or len(src_paths) < PARALLEL_MIN_PAGES
+    if serial or profiler is not None:
+        for src_path in src_paths:
+            page_terms = options.new_terms()
+            try:
+                page = render_page(src_path, options, profiler, page_terms)
+            except Exception as e:
+                yield None, f'{type(e).__name__}: {e}'
+                continue
+            if page_terms is not None:
+                terms[src_path] = page_terms
+            yield page, None
+        return
+
+    large = [is_large(src_path) for src_path in src_paths]
+    small_paths = [src_path for src_path, big in zip(src_paths, large) if not big]
+    chunksize = max(1, min(64, len(small_paths) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(options,)) as pool:
+        # the workers keep rendering while a large page streams out here
+        small_results = pool.map(_render_job, small_paths, chunksize=chunksize)
+        for src_path, big in zip(src_paths, large):
+            if not big:
+                page, error, page_terms = next(small_results)
+                if page_terms is not None:
+                    terms[src_path] = page_terms
+                yield page, error
+                continue
+            page_terms = options.new_terms()
+            try:
+                page = stream_page(src_path, options, page_terms)
+            except Exception as e:
+                yield None, f'{type(e).__name__}: {e}'
+                continue
+            if page_terms is not None:
+                terms[src_path] = page_terms
+            yield page, None
+
+class BuildError(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        lines = [f'{len(failures)} page(s) failed to build:']
+        lines += [f'  {path}: {message}' for path, message in failures]
+        super().__init__('\n'.join(lines))
+
+
+class BuildReport:
+    def __init__(self):
+        self.rebuilt = []
+        # rebuilt pages whose output already held the same HTML
+        self.unchanged = []
+        self.skipped = []
+        self.removed = []
+        # with collect_terms, the terms.PageTerms of every page rebuilt, by source path
+        self.terms = {}
 
-    with open(dst_path, 'w') as f:
-        f.write(page_text)
+    def summary(self):
+        written = len(self.rebuilt) - len(self.unchanged)
+        return (f'{len(self.rebuilt)} pages rebuilt ({written} written, {len(self.unchanged)} unchanged), '
+                f'{len(self.skipped)} skipped, {len(self.removed)} removed')
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
-    #print(f"Processing directory: {dir_path_content}")
+
+def find_pages(dir_path_content, dest_dir_path, ignore=DEFAULT_IGNORE):
+    """
+    Return (markdown_path, html_path) pairs for every page under
+    dir_path_content that no ignore pattern matches, sorted by source path
+    """
+    pages = []
+    for rel_path, entry in walk_files(dir_path_content, ignore):
+        if rel_path.endswith('.md'):
+            parts = rel_path[:-len('.md')].split('/')
+            pages.append((entry.path, os.path.join(dest_dir_path, *parts) + '.html'))
+    # the walk lists a directory's files after its subdirectories': blog/post.md before blog.md
+    pages.sort()
+    return pages
+
+def shard_of(rel_path, count):
+    """
+    The shard, of count, that builds the page at rel_path under the
+    content directory. It comes from a hash of the path alone, so adding
+    or removing pages never moves the others between shards
+    """
+    return int(hash_bytes(rel_path.replace(os.sep, '/').encode())[:8], 16) % count
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, manifest_path=None, jobs=1,
+                             profiler=None, block_cache=None, page_cache=None, changed_paths=None,
+                             async_io=False, ignore=DEFAULT_IGNORE, asset_map=None,
+                             image_sizes=None, shard=None, collect_terms=False, manifest=None):
+    """
+    Generate a page for every markdown file under dir_path_content that
+    no ignore pattern matches.
+    With a manifest_path, pages whose inputs (source and template) and
+    generator are unchanged since the last build are skipped, and outputs
+    of deleted sources are removed; a BuildManifest given as manifest is
+    used instead and left to the caller to save. Given the changed_paths since that
+    build, as a watcher reports them, only the pages depending on them
+    are looked at, without hashing the rest. jobs > 1 renders pages in a
+    process pool, and async_io overlaps reading, rendering and writing
+    pages (see pipeline.run_pipeline).
+    A profiling.BuildProfiler times every stage of every page, a
+    block_cache.BlockCache reuses the HTML of blocks rendered before, and
+    a page_cache.PageCache skips parsing markdown already parsed by an
+    earlier build and is trimmed to its size limit afterwards. With an
+    assets.AssetMap, asset URLs in the template and the links and images
+    of the markdown point at the fingerprinted copies, and the map is an
+    input of every page; so are the images.ImageSizes used to size the
+    images of the content.
+    With a shard (i, n), only the pages that shard_of assigns to shard i
+    are built, and the manifest records the whole site's page list for
+    shards.merge_shards to check against. With collect_terms, the search
+    terms of every page rebuilt are counted as it renders and returned in
+    the report (see search.update_search_index).
+    Failing pages are reported together, in page order, as a BuildError
+    once every other page has been written
+    """
     os.makedirs(dest_dir_path, exist_ok=True)
-    for item in os.listdir(dir_path_content):
-        item_path = os.path.join(dir_path_content, item)
-        rel_path = os.path.relpath(item_path, dir_path_content)
-        dest_path = os.path.join(dest_dir_path, rel_path)
-
-        #print(f"Processing item: {item_path}")
-        if os.path.isfile(item_path):
-            if item.endswith('.md'):
-                #print(f"Generating page for: {item_path}")
-                dest_html_path = os.path.splitext(dest_path)[0] + '.html'
-                generate_page(item_path, template_path, dest_html_path)
+    report = BuildReport()
+    pages = find_pages(dir_path_content, dest_dir_path, ignore)
+    all_sources = [src_path for src_path, _ in pages]
+    if shard is not None:
+        pages = [(src_path, dst_path) for src_path, dst_path in pages
+                 if shard_of(os.path.relpath(src_path, dir_path_content), shard[1]) == shard[0]]
+
+    save = manifest is None
+    manifest = load_manifest(manifest_path, manifest)
+    affected = None
+    if manifest is not None:
+        version = generator_version()
+        # a list of changes can only stand in for hashing every input if
+        # the recorded hashes were made by this code
+        if changed_paths is not None and manifest.version == version:
+            affected = manifest.dependents(changed_paths)
+        manifest.reset(version)
+        if shard is not None:
+            manifest.shard = {'index': shard[0], 'count': shard[1], 'pages': all_sources}
         else:
-            #print(f"Found directory: {item_path}")
-            os.makedirs(dest_path, exist_ok=True)
-            generate_pages_recursive(item_path, template_path, dest_path)
\ No newline at end of file
+            manifest.shard = None
+        template_hash = hash_file(template_path)
+        if asset_map is not None:
+            asset_map_hash = asset_map.digest()
+        if image_sizes is not None:
+            image_sizes_hash = image_sizes.digest()
+
+    stale = []
+    for src_path, dst_path in pages:
+        deps = reason = None
+        if manifest is not None:
+            if affected is not None and src_path not in affected and is_recorded(manifest, src_path, dst_path):
+                report.skipped.append(dst_path)
+                continue
+            deps = {src_path: hash_file(src_path), template_path: template_hash}
+            if asset_map is not None:
+                deps[asset_map.path] = asset_map_hash
+            if image_sizes is not None:
+                deps[image_sizes.path] = image_sizes_hash
+            reason = manifest.stale_reason(src_path, dst_path, deps)
+            if reason is None:
+                report.skipped.append(dst_path)
+                continue
+        stale.append((src_path, dst_path, deps, reason))
+
+    failures = []
+    template = load_template(template_path)
+    if asset_map is not None:
+        template = template.map_literals(asset_map.rewrite_html)
+    stale_pages = [(src_path, dst_path) for src_path, dst_path, _, _ in stale]
+    options = RenderOptions(template, block_cache, page_cache, asset_map, image_sizes, collect_terms,
+                            dir_path_content)
+    terms = {} if collect_terms else None
+    if async_io and profiler is None:
+        from pipeline import run_pipeline
+        outcomes = run_pipeline(stale_pages, options, jobs, terms=terms)
+    else:
+        results = render_pages([src_path for src_path, _ in stale_pages], options, jobs, profiler, terms)
+        outcomes = write_pages(stale_pages, results, profiler)
+    for (src_path, dst_path, deps, reason), (written, error) in zip(stale, outcomes):
+        if error is not None:
+            failures.append((src_path, error))
+            continue
+        report.rebuilt.append(dst_path)
+        if terms is not None:
+            report.terms[src_path] = terms[src_path]
+        if not written:
+            report.unchanged.append(dst_path)
+        if manifest is not None:
+            manifest.record(src_path, dst_path, deps, reason)
+
+    if manifest is not None:
+        for orphan in manifest.forget_missing({src_path for src_path, _ in pages}):
+            if os.path.isfile(orphan):
+                os.remove(orphan)
+                report.removed.append(orphan)
+                remove_empty_dirs(os.path.dirname(orphan), dest_dir_path)
+        if save:
+            manifest.save()
+    if page_cache is not None:
+        page_cache.trim()
+
+    if failures:
+        raise BuildError(failures)
+    return report
+
+def write_pages(pages, results, profiler=None):
+    """
+    Write every rendered page of results to its output in pages, yielding
+    (written, error) for each page: whether the output changed, or the
+    error that stopped it
+    """
+    for (src_path, dst_path), (page, error) in zip(pages, results):
+        written = None
+        if error is None:
+            try:
+                if profiler is not None:
+                    with profiler.stage(src_path, 'write'):
+                        written = write_page(dst_path, page)
+                else:
+                    written = write_page(dst_path, page)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+        yield written, error
+
+def is_recorded(manifest, src_path, dst_path):
+    """Whether the last build wrote src_path to dst_path, and the output is still there"""
+    entry = manifest.pages.get(src_path)
+    return (
+        entry is not None and
+        bool(entry.get('deps')) and
+        entry.get('output') == dst_path and
+        os.path.isfile(dst_path)
+    )
+
+def why_rebuilt(manifest_path, path):
+    """
+    Describe why the page with the given source or output path was last
+    rendered, and whether each of its inputs has changed since
+    """
+    manifest = BuildManifest.load(manifest_path)
+    found = manifest.find(path)
+    if found is None:
+        raise ValueError(f'{path} is not a page recorded in {manifest_path}')
+    src_path, entry = found
+    lines = [f"{entry['output']} (from {src_path}) was last rebuilt because: {entry.get('reason')}"]
+    if not entry.get('deps'):
+        lines.append('its inputs were forgotten when the generator changed')
+        return '\n'.join(lines)
+    lines.append('depends on:')
+    for dep_path, dep_hash in sorted(entry['deps'].items()):
+        current = hash_file(dep_path) if os.path.isfile(dep_path) else None
+        state = 'unchanged' if current == dep_hash else 'changed since'
+        lines.append(f'  {dep_path}  {dep_hash[:12]}  ({state})')
+    return '\n'.join(lines)
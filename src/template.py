@@ -0,0 +1,86 @@
+import os
+import re
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class Template:
+    """
+    A page template parsed once into literal segments and the
+    {{ Name }} placeholders between them, so rendering a page is a single
+    join. Instances are plain data and can be pickled into worker processes
+    """
+    def __init__(self, text):
+        self.segments = []
+        self.slots = []
+        pos = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            self.segments.append(text[pos:match.start()])
+            self.slots.append(match.group(1))
+            pos = match.end()
+        self.segments.append(text[pos:])
+        self.placeholders = frozenset(self.slots)
+        self.repeated = frozenset(name for name in self.placeholders if self.slots.count(name) > 1)
+
+    def render(self, values):
+        """Fill every placeholder from the values mapping"""
+        return ''.join(self.iter_render(values))
+
+    def iter_render(self, values):
+        """
+        Yield the filled-in template as fragments. A value may be a string
+        or an iterable of string fragments, such as HTMLNode.iter_html()
+        """
+        for name in self.repeated:
+            if name in values and not isinstance(values[name], str):
+                # an iterator can only be consumed once, so join it up front
+                values = {**values, name: ''.join(values[name])}
+
+        yield self.segments[0]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            if name not in values:
+                raise ValueError(f"Unknown placeholder '{{{{ {name} }}}}' in template")
+            value = values[name]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield segment
+
+    def map_literals(self, func):
+        """Return a copy with func applied to the text between the placeholders"""
+        template = Template('')
+        template.segments = [func(segment) for segment in self.segments]
+        template.slots = list(self.slots)
+        template.placeholders = self.placeholders
+        template.repeated = self.repeated
+        return template
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Template) and
+            self.segments == other.segments and
+            self.slots == other.slots
+        )
+
+    def __repr__(self) -> str:
+        return f'Template(slots={self.slots})'
+
+
+_template_cache = {}
+
+def load_template(path):
+    """
+    Compile the template at path, reusing the compiled object for as long
+    as the file is unchanged
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cached = _template_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+
+    with open(path, 'r') as file:
+        template = Template(file.read())
+    _template_cache[key] = ((stat.st_mtime_ns, stat.st_size), template)
+    return template
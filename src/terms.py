@@ -0,0 +1,42 @@
+import re
+from collections import Counter
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Yield the lowercased words of text that are worth indexing"""
+    for term in TERM_PATTERN.findall(text.lower()):
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            yield term
+
+
+def count_node(node):
+    """
+    A Counter of the terms in the text of an HTMLNode tree. The text is
+    read from the nodes, not the serialized HTML, which leaves text such
+    as x<y unescaped
+    """
+    counts = Counter()
+    for text in node.iter_text():
+        counts.update(tokenize(text))
+    return counts
+
+
+class PageTerms:
+    """
+    The title of a page and a Counter of the terms in the text of its
+    body, filled in while the page renders. Plain data, so worker
+    processes can send it back with the page
+    """
+    def __init__(self, title=None, counts=None):
+        self.title = title
+        self.counts = counts if counts is not None else Counter()
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageTerms) and (self.title, self.counts) == (other.title, other.counts)
+
+    def __repr__(self) -> str:
+        return f'PageTerms({self.title!r}, {len(self.counts)} terms)'
@@ -0,0 +1,188 @@
+import json
+import os
+import tempfile
+import unittest
+from assets import AssetMap, fingerprinted_path, page_base
+from build_manifest import hash_bytes
+from site_generation import generate_pages_recursive, sync_dir
+
+
+class TestAssetMap(unittest.TestCase):
+    def setUp(self):
+        self.asset_map = AssetMap({"/index.css": "/index.0123abcd.css", "/images/a.png": "/images/a.89ab4567.png"})
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path("css/index.css", "0123456789abcdef"), "css/index.01234567.css")
+        self.assertEqual(fingerprinted_path("logo.min.js", "fedcba9876543210"), "logo.min.fedcba98.js")
+
+    def test_rewrite_html(self):
+        html = '<link rel="stylesheet" href="/index.css"><img src=\'/images/a.png\'><a href="/blog">x</a>'
+        self.assertEqual(
+            self.asset_map.rewrite_html(html),
+            '<link rel="stylesheet" href="/index.0123abcd.css"><img src=\'/images/a.89ab4567.png\'>'
+            '<a href="/blog">x</a>',
+        )
+
+    def test_rewrite_css(self):
+        css = 'body { background: url("/images/a.png"); } div { background: url(/images/b.png) }'
+        self.assertEqual(
+            self.asset_map.rewrite_css(css),
+            'body { background: url("/images/a.89ab4567.png"); } div { background: url(/images/b.png) }',
+        )
+
+    def test_rewrite_css_relative(self):
+        asset_map = AssetMap({"/css/images/bg.png": "/css/images/bg.0123abcd.png",
+                              "/images/a.png": "/images/a.89ab4567.png"})
+        css = "div { background: url(images/bg.png) } p { background: url('../images/a.png?v=1') }"
+        self.assertEqual(
+            asset_map.rewrite_css(css, "/css/site.css"),
+            "div { background: url(/css/images/bg.0123abcd.png) } "
+            "p { background: url('/images/a.89ab4567.png?v=1') }",
+        )
+
+    def test_rewrite_html_leaves_relative_urls(self):
+        self.assertEqual(self.asset_map.rewrite_html('<img src="images/a.png">'), '<img src="images/a.png">')
+
+    def test_rewrite_markdown(self):
+        text = "![A](/images/a.png) and [full image](/images/a.png#top) and ![B](/images/b.png)"
+        self.assertEqual(
+            self.asset_map.rewrite_markdown(text),
+            "![A](/images/a.89ab4567.png) and [full image](/images/a.89ab4567.png#top) and ![B](/images/b.png)",
+        )
+
+    def test_rewrite_markdown_relative(self):
+        text = "![A](../images/a.png) [css](../index.css) [page](post.md) [B](images/a.png)"
+        self.assertEqual(
+            self.asset_map.rewrite_markdown(text, "/blog/"),
+            "![A](/images/a.89ab4567.png) [css](/index.0123abcd.css) [page](post.md) [B](images/a.png)",
+        )
+
+    def test_rewrite_markdown_skips_code(self):
+        text = "`![A](/images/a.png)` ![A](/images/a.png)\n\n```\n[link](/images/a.png)\n```\n[link](/images/a.png)\n"
+        self.assertEqual(
+            self.asset_map.rewrite_markdown(text),
+            "`![A](/images/a.png)` ![A](/images/a.89ab4567.png)\n\n```\n[link](/images/a.png)\n```\n"
+            "[link](/images/a.89ab4567.png)\n",
+        )
+
+    def test_rewrite_markdown_follows_renderer_blocks(self):
+        text = ("- [a](/images/a.png)\n- `[b](/images/a.png)`\n\n**[c](/images/a.png)**\n\n"
+                "```\n![d](/images/a.png)\n```\n\n> ![e](/images/a.png)\n")
+        expected = ("- [a](/images/a.89ab4567.png)\n- `[b](/images/a.png)`\n\n**[c](/images/a.png)**\n\n"
+                    "```\n![d](/images/a.png)\n```\n\n> ![e](/images/a.89ab4567.png)\n")
+        self.assertEqual(self.asset_map.rewrite_markdown(text), expected)
+        lines = self.asset_map.rewrite_markdown_lines(text.splitlines(keepends=True))
+        self.assertEqual("".join(lines), expected)
+
+    def test_page_base(self):
+        self.assertEqual(page_base(os.path.join("content", "index.md"), "content"), "/")
+        self.assertEqual(page_base(os.path.join("content", "blog", "post.md"), "content"), "/blog/")
+        self.assertEqual(page_base(os.path.join("content", "blog", "post.md"), None), "/")
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "asset-manifest.json")
+            with open(path, "w") as file:
+                file.write(self.asset_map.to_json())
+            loaded = AssetMap.load(path)
+        self.assertEqual(loaded, self.asset_map)
+        self.assertEqual(loaded.digest(), self.asset_map.digest())
+
+
+class TestFingerprintBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, "static")
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.manifest = os.path.join(root, "cache", "manifest.json")
+        self.template = os.path.join(root, "template.html")
+        self.write(os.path.join(self.static, "index.css"), "body { background: url(/images/a.png); }")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(os.path.join(self.static, "robots.txt"), "User-agent: *")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![A](/images/a.png)")
+        self.write(self.template, '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as file:
+            return file.read()
+
+    def build(self):
+        report = sync_dir(self.static, self.public, self.manifest, fingerprint=True)
+        generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                 asset_map=report.asset_map)
+        return report
+
+    def test_assets_renamed_and_referenced(self):
+        report = self.build()
+        png = fingerprinted_path("images/a.png", hash_bytes(b"png"))
+        urls = json.loads(self.read("asset-manifest.json"))
+        self.assertEqual(urls["/images/a.png"], "/" + png)
+        css = urls["/index.css"]
+        self.assertEqual(self.read(css[1:]), f"body {{ background: url(/{png}); }}")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+        self.assertEqual(self.read("robots.txt"), "User-agent: *")
+
+        page = self.read("index.html")
+        self.assertIn(f'<link href="{css}">', page)
+        self.assertIn(f'src="/{png}"', page)
+        self.assertTrue(report.asset_map_changed)
+
+    def test_changed_asset_renames_and_rebuilds(self):
+        self.build()
+        old_urls = json.loads(self.read("asset-manifest.json"))
+        self.write(os.path.join(self.static, "images", "a.png"), "new png")
+        report = self.build()
+        urls = json.loads(self.read("asset-manifest.json"))
+        self.assertNotEqual(urls["/images/a.png"], old_urls["/images/a.png"])
+        # the stylesheet names the image, so its hash moves with it
+        self.assertNotEqual(urls["/index.css"], old_urls["/index.css"])
+        for url in old_urls.values():
+            self.assertFalse(os.path.exists(os.path.join(self.public, url[1:])))
+        self.assertIn(urls["/images/a.png"], self.read("index.html"))
+        self.assertTrue(report.asset_map_changed)
+
+    def test_links_and_relative_references(self):
+        self.write(os.path.join(self.static, "css", "site.css"), "div { background: url(images/bg.png); }")
+        self.write(os.path.join(self.static, "css", "images", "bg.png"), "bg")
+        self.write(os.path.join(self.content, "blog", "post.md"),
+                   "# Post\n\n![A](../images/a.png)\n\n[full image](/images/a.png)\n\n`![A](../images/a.png)`")
+        self.build()
+        urls = json.loads(self.read("asset-manifest.json"))
+        png = urls["/images/a.png"]
+        self.assertEqual(self.read(urls["/css/site.css"][1:]),
+                         f'div {{ background: url({urls["/css/images/bg.png"]}); }}')
+
+        page = self.read("blog", "post.html")
+        self.assertIn(f'src="{png}"', page)
+        self.assertIn(f'href="{png}"', page)
+        self.assertIn("<code>![A](../images/a.png)</code>", page)
+        for url in urls.values():
+            self.assertTrue(os.path.exists(os.path.join(self.public, url[1:])))
+
+    def test_unchanged_rebuild(self):
+        self.build()
+        report = self.build()
+        self.assertEqual(report.copied, [])
+        self.assertFalse(report.asset_map_changed)
+
+    def test_turning_fingerprinting_off(self):
+        self.build()
+        sync_dir(self.static, self.public, self.manifest)
+        generate_pages_recursive(self.content, self.template, self.public, self.manifest)
+        self.assertEqual(self.read("index.css"), "body { background: url(/images/a.png); }")
+        self.assertIn('<link href="/index.css">', self.read("index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "asset-manifest.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import pickle
+import tempfile
+import unittest
+from block_cache import BlockCache
+from textnode_enhancements import markdown_to_page
+
+PAGE = """# Title
+
+A shared **footer** paragraph.
+
+- one
+- two
+
+> quoted text
+"""
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = BlockCache()
+        self.assertIsNone(cache.get(("paragraph", "a")))
+        cache.put(("paragraph", "a"), "<p>a</p>")
+        self.assertEqual(cache.get(("paragraph", "a")), "<p>a</p>")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = BlockCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertEqual(list(cache.entries), ["a", "c"])
+
+    def test_same_html_with_and_without_cache(self):
+        cache = BlockCache()
+        title, plain = markdown_to_page(PAGE)
+        for _ in range(2):
+            cached_title, cached = markdown_to_page(PAGE, cache)
+            self.assertEqual(cached_title, title)
+            self.assertEqual(cached.to_html(), plain.to_html())
+        self.assertEqual(cache.hits, cache.misses)
+
+    def test_pickle_drops_counters(self):
+        cache = BlockCache()
+        cache.put("a", "A")
+        cache.get("a")
+        clone = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(clone.hits, 0)
+        self.assertEqual(clone.get("a"), "A")
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "blocks.pickle")
+            cache = BlockCache()
+            cache.put("a", "A")
+            cache.save(path, "v1")
+            self.assertEqual(BlockCache.load(path, "v1").get("a"), "A")
+            self.assertEqual(len(BlockCache.load(path, "v2").entries), 0)
+
+    def test_save_beside_another_writer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blocks.pickle")
+            # another shard halfway through saving the same cache
+            other = f"{path}.{os.getpid() + 1}.tmp"
+            with open(other, "wb") as file:
+                file.write(b"partial")
+            cache = BlockCache()
+            cache.put("a", "A")
+            cache.save(path, "v1")
+            self.assertEqual(BlockCache.load(path, "v1").get("a"), "A")
+            with open(other, "rb") as file:
+                self.assertEqual(file.read(), b"partial")
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(["blocks.pickle", os.path.basename(other)]))
+
+    def test_load_missing_or_corrupt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blocks.pickle")
+            self.assertEqual(len(BlockCache.load(path, "v1").entries), 0)
+            with open(path, "wb") as file:
+                file.write(b"not a pickle")
+            self.assertEqual(len(BlockCache.load(path, "v1").entries), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
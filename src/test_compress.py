@@ -0,0 +1,98 @@
+import gzip
+import os
+import tempfile
+import unittest
+from build_manifest import BuildManifest
+from compress import compress_tree, gzip_file, remove_sidecars
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "public")
+        self.manifest = os.path.join(self.tmp.name, "cache", "manifest.json")
+        self.write("index.html", "<p>hello</p>" * 200)
+        self.write("blog/post.html", "<p>post</p>" * 200)
+        self.write("index.css", "body {}")
+        self.write("images/logo.png", "png" * 1000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def path(self, rel_path):
+        return os.path.join(self.root, rel_path)
+
+    def compress(self, **kwargs):
+        return compress_tree(self.root, self.manifest, **kwargs)
+
+    def test_text_files_over_threshold(self):
+        report = self.compress()
+        self.assertEqual(sorted(report.compressed), [self.path("blog/post.html.gz"), self.path("index.html.gz")])
+        with gzip.open(self.path("index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), "<p>hello</p>" * 200)
+        self.assertEqual(len(self.compress(min_size=1).compressed), 1)
+
+    def test_deterministic(self):
+        first = gzip_file(self.path("index.html"))
+        with open(first, "rb") as file:
+            data = file.read()
+        gzip_file(self.path("index.html"))
+        with open(first, "rb") as file:
+            self.assertEqual(file.read(), data)
+
+    def test_unchanged_outputs_are_skipped(self):
+        self.compress()
+        report = self.compress()
+        self.assertEqual(report.compressed, [])
+        self.assertEqual(len(report.unchanged), 2)
+        self.write("index.html", "<p>changed</p>" * 200)
+        os.utime(self.path("index.html"), ns=(0, 10**9))
+        self.assertEqual(self.compress().compressed, [self.path("index.html.gz")])
+
+    def test_edit_keeping_mtime_recompressed(self):
+        # a copy2 of an edited source keeps the old mtime, and here the size too
+        self.compress()
+        stat = os.stat(self.path("index.html"))
+        self.write("index.html", "<p>HELLO</p>" * 200)
+        os.utime(self.path("index.html"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.compress().compressed, [self.path("index.html.gz")])
+        with gzip.open(self.path("index.html.gz"), "rt") as file:
+            self.assertEqual(file.read(), "<p>HELLO</p>" * 200)
+        # touched without a change, the file is hashed again but not compressed
+        os.utime(self.path("index.html"))
+        report = self.compress()
+        self.assertEqual(report.compressed, [])
+        self.assertEqual(len(report.unchanged), 2)
+
+    def test_sidecars_removed_when_not_compressing(self):
+        self.write("download.json.gz", "not ours")
+        self.compress()
+        manifest = BuildManifest.load(self.manifest)
+        report = remove_sidecars(self.root, manifest)
+        self.assertEqual(sorted(report.removed), [self.path("blog/post.html.gz"), self.path("index.html.gz")])
+        self.assertEqual(manifest.sidecars, {})
+        self.assertTrue(os.path.exists(self.path("download.json.gz")))
+
+    def test_stale_sidecars_removed(self):
+        self.write("download.json.gz", "not ours")
+        self.compress()
+        os.remove(self.path("blog/post.html"))
+        self.write("index.html", "small")
+        report = self.compress()
+        self.assertEqual(sorted(report.removed), [self.path("blog/post.html.gz"), self.path("index.html.gz")])
+        self.assertFalse(os.path.exists(self.path("blog")))
+        self.assertTrue(os.path.exists(self.path("download.json.gz")))
+
+    def test_serial(self):
+        report = self.compress(threads=1, level=1)
+        self.assertEqual(len(report.compressed), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
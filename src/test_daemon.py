@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from daemon import BuildDaemon, PageRenderer, make_server, remove_stale_socket, request
+
+
+class FakeRenderer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def render(self, markdown_text):
+        time.sleep(self.delay)
+        return f"<p>{markdown_text}</p>"
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def test_render_build_and_stats(self):
+        builds = []
+
+        def build(paths):
+            builds.append(paths)
+            print("1 pages rebuilt")
+            return 0
+
+        daemon = BuildDaemon(build, FakeRenderer())
+        self.assertEqual(daemon.handle({"op": "render", "markdown": "hi"}), {"ok": True, "html": "<p>hi</p>"})
+        self.assertEqual(daemon.handle({"op": "build", "paths": ["content/a.md"]}),
+                         {"ok": True, "output": ["1 pages rebuilt"]})
+        self.assertEqual(daemon.handle({"op": "build"})["ok"], True)
+        self.assertEqual(builds, [["content/a.md"], None])
+
+        stats = daemon.handle({"op": "stats"})["stats"]
+        self.assertEqual(stats["requests"]["render"]["count"], 1)
+        self.assertEqual(stats["requests"]["build"]["count"], 2)
+        self.assertEqual(stats["last_build"]["status"], 0)
+
+    def test_bad_requests(self):
+        daemon = BuildDaemon(lambda paths: 0, FakeRenderer())
+        self.assertFalse(daemon.handle({"op": "explode"})["ok"])
+        self.assertFalse(daemon.handle(["op"])["ok"])
+        self.assertFalse(daemon.handle({"op": "render"})["ok"])
+        self.assertFalse(daemon.handle({"op": "build", "paths": "content"})["ok"])
+        self.assertEqual(daemon.stats.errors, 4)
+
+    def test_failed_build(self):
+        daemon = BuildDaemon(lambda paths: 1, FakeRenderer())
+        self.assertEqual(daemon.handle({"op": "build"})["error"], "build failed")
+
+    def test_timeout(self):
+        daemon = BuildDaemon(lambda paths: 0, FakeRenderer(delay=0.3), timeout=0.05)
+        response = daemon.handle({"op": "render", "markdown": "slow"})
+        self.assertFalse(response["ok"])
+        self.assertIn("timed out", response["error"])
+        self.assertEqual(daemon.stats.timeouts, 1)
+
+    def test_concurrency_limit(self):
+        release = threading.Event()
+
+        def build(paths):
+            release.wait(5)
+            return 0
+
+        daemon = BuildDaemon(build, FakeRenderer(), max_concurrent=1, timeout=0.2)
+        first = threading.Thread(target=daemon.handle, args=({"op": "build"},))
+        first.start()
+        time.sleep(0.05)
+        self.assertEqual(daemon.handle({"op": "render", "markdown": "x"}), {"ok": False, "error": "busy"})
+        self.assertEqual(daemon.stats.rejected, 1)
+        release.set()
+        first.join()
+        self.assertTrue(daemon.handle({"op": "render", "markdown": "x"})["ok"])
+
+
+class TestDaemonSocket(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "daemon.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        daemon = BuildDaemon(lambda paths: 0, FakeRenderer())
+        server = make_server(daemon, self.socket_path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(request(self.socket_path, {"op": "render", "markdown": "hi"})["html"], "<p>hi</p>")
+            with self.assertRaises(Exception):
+                remove_stale_socket(self.socket_path)
+            self.assertEqual(request(self.socket_path, {"op": "shutdown"}), {"ok": True})
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        finally:
+            server.server_close()
+
+        # the socket file outlived its server and is cleaned up for the next one
+        remove_stale_socket(self.socket_path)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+class TestPageRenderer(unittest.TestCase):
+    def test_template_reloaded_when_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template_path = os.path.join(tmp, "template.html")
+            with open(template_path, "w") as file:
+                file.write("<title>{{ Title }}</title>{{ Content }}")
+            renderer = PageRenderer(template_path, image_sizes_path=os.path.join(tmp, "missing.json"))
+            self.assertEqual(renderer.render("# Hi\n\ntext"), "<title>Hi</title><div><h1>Hi</h1><p>text</p></div>")
+            with open(template_path, "w") as file:
+                file.write("<h2>{{ Title }}</h2>{{ Content }}")
+            os.utime(template_path, ns=(0, 10 ** 9))
+            self.assertTrue(renderer.render("# Hi\n\ntext").startswith("<h2>Hi</h2>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 from htmlnode import HTMLNode
+from textnode import TextNode
+from textnode_enhancements import text_node_to_html_node_v2
 
 class TestHTMLNode(unittest.TestCase):
     def test_props(self):
@@ -26,6 +28,32 @@ class TestHTMLNode(unittest.TestCase):
         self.assertEqual(node.children, children)
         self.assertEqual(node.props, {"class": "container"})
 
+    def test_to_html_nested(self):
+        node = HTMLNode("div", None, [HTMLNode("p", "text"), "<hr>"], {"class": "c"})
+        self.assertEqual(node.to_html(), '<div class="c"><p>text</p><hr></div>')
+        self.assertEqual(list(node.iter_html()), ['<div class="c">', "<p>", "text", "</p>", "<hr>", "</div>"])
+
+    def test_invalid_child(self):
+        node = HTMLNode("div", None, [42])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
+    def test_slots(self):
+        node = HTMLNode("p", "text")
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+    def test_link_props_shared(self):
+        first = text_node_to_html_node_v2(TextNode("one", "link", "/a"))
+        second = text_node_to_html_node_v2(TextNode("two", "link", "/a"))
+        self.assertIs(first.props, second.props)
+        self.assertEqual(second.to_html(), '<a href="/a">two</a>')
+
+    def test_iter_text(self):
+        node = HTMLNode("p", None, [HTMLNode(None, "Hello "), HTMLNode("a", "world", None, {"href": "/w"}), "!"])
+        self.assertEqual("".join(node.iter_text()), "Hello world!")
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,167 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+import images
+from images import ImageSizes, image_size, probe_images
+from site_generation import generate_pages_recursive
+
+
+def png(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height) + b'\x08\x02'
+
+def gif(width, height):
+    return b'GIF89a' + struct.pack('<HH', width, height) + b'\x00' * 8
+
+def jpeg(width, height):
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+    frame = b'\xff\xc2' + struct.pack('>HBHH', 17, 8, height, width) + b'\x00' * 10
+    return b'\xff\xd8' + app0 + frame + b'\xff\xda'
+
+def webp(chunk, payload):
+    return b'RIFF' + struct.pack('<I', 100) + b'WEBP' + chunk + struct.pack('<I', 50) + payload
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, data):
+        path = os.path.join(self.tmp.name, 'image')
+        with open(path, 'wb') as file:
+            file.write(data)
+        return image_size(path)
+
+    def test_formats(self):
+        self.assertEqual(self.size_of(png(1344, 896)), (1344, 896))
+        self.assertEqual(self.size_of(gif(16, 9)), (16, 9))
+        self.assertEqual(self.size_of(jpeg(640, 480)), (640, 480))
+        self.assertEqual(self.size_of(webp(b'VP8 ', b'\x00\x00\x00\x9d\x01\x2a' + struct.pack('<HH', 300, 200))),
+                         (300, 200))
+        bits = (300 - 1) | ((200 - 1) << 14)
+        self.assertEqual(self.size_of(webp(b'VP8L', b'\x2f' + struct.pack('<I', bits))), (300, 200))
+        extended = b'\x00' * 4 + (300 - 1).to_bytes(3, 'little') + (200 - 1).to_bytes(3, 'little')
+        self.assertEqual(self.size_of(webp(b'VP8X', extended)), (300, 200))
+
+    def test_unknown_or_truncated(self):
+        self.assertIsNone(self.size_of(b'<svg xmlns="http://www.w3.org/2000/svg"/>'))
+        self.assertIsNone(self.size_of(png(10, 10)[:18]))
+        self.assertIsNone(self.size_of(jpeg(640, 480)[:25]))
+        self.assertIsNone(self.size_of(b''))
+
+
+class TestImageHints(unittest.TestCase):
+    def setUp(self):
+        self.sizes = ImageSizes({'/a.png': (640, 480), '/b.png': (16, 9)})
+
+    def test_first_image_eager_rest_lazy(self):
+        fragments = ['<p>', '<img src="/a.png" alt="A">', '</p><p>', '<img src="/b.png" alt="B">',
+                     '<img src="/c.png" alt="C">', '</p>']
+        self.assertEqual(list(self.sizes.hint_fragments(fragments)), [
+            '<p>',
+            '<img src="/a.png" alt="A" width="640" height="480" loading="eager" fetchpriority="high" '
+            'decoding="async">',
+            '</p><p>',
+            '<img src="/b.png" alt="B" width="16" height="9" loading="lazy" decoding="async">',
+            '<img src="/c.png" alt="C" loading="lazy" decoding="async">',
+            '</p>',
+        ])
+
+    def test_existing_attributes_kept(self):
+        html = '<p>text</p><img src="/a.png" width="320" loading="lazy" />'
+        self.assertEqual(self.sizes.hint_html(html),
+                         '<p>text</p><img src="/a.png" width="320" loading="lazy" height="480" '
+                         'fetchpriority="high" decoding="async"/>')
+
+    def test_relative_source_resolved(self):
+        html = '<img src="../a.png"><img src="b.png?v=2"><img src="https://example.com/a.png">'
+        self.assertEqual(self.sizes.hint_html(html, '/blog/'),
+                         '<img src="../a.png" width="640" height="480" loading="eager" fetchpriority="high" '
+                         'decoding="async"><img src="b.png?v=2" loading="lazy" decoding="async">'
+                         '<img src="https://example.com/a.png" loading="lazy" decoding="async">')
+
+
+class TestProbeImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.static = os.path.join(root, 'static')
+        self.sizes_path = os.path.join(root, 'cache', 'image-sizes.json')
+        self.manifest = os.path.join(root, 'cache', 'manifest.json')
+        self.write(os.path.join(self.static, 'images', 'a.png'), png(640, 480))
+        self.write(os.path.join(self.static, 'images', 'b.gif'), gif(16, 9))
+        self.write(os.path.join(self.static, 'index.css'), b'body {}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+
+    def probe(self):
+        return probe_images(self.static, self.sizes_path, self.manifest)
+
+    def test_probe_and_save(self):
+        sizes, changed = self.probe()
+        self.assertTrue(changed)
+        self.assertEqual(sizes.sizes, {'/images/a.png': (640, 480), '/images/b.gif': (16, 9)})
+        self.assertEqual(ImageSizes.load(self.sizes_path), sizes)
+
+    def test_repeat_probe_reads_nothing(self):
+        self.probe()
+        with mock.patch.object(images, 'image_size', side_effect=AssertionError), \
+                mock.patch.object(images, 'hash_file', side_effect=AssertionError):
+            sizes, changed = self.probe()
+        self.assertFalse(changed)
+        self.assertEqual(sizes.size('/images/a.png'), (640, 480))
+
+    def test_same_content_not_probed_again(self):
+        self.probe()
+        self.write(os.path.join(self.static, 'images', 'copy.png'), png(640, 480))
+        with mock.patch.object(images, 'image_size', side_effect=AssertionError):
+            sizes, changed = self.probe()
+        self.assertTrue(changed)
+        self.assertEqual(sizes.size('/images/copy.png'), (640, 480))
+
+    def test_changed_image_rebuilds_pages(self):
+        content = os.path.join(self.tmp.name, 'content')
+        public = os.path.join(self.tmp.name, 'public')
+        template = os.path.join(self.tmp.name, 'template.html')
+        self.write(os.path.join(content, 'index.md'), b'# Home\n\n![A](/images/a.png)')
+        self.write(template, b'<title>{{ Title }}</title>{{ Content }}')
+
+        def build():
+            sizes, _ = self.probe()
+            report = generate_pages_recursive(content, template, public, self.manifest, image_sizes=sizes)
+            with open(os.path.join(public, 'index.html')) as file:
+                return report, file.read()
+
+        _, html = build()
+        self.assertIn('width="640" height="480"', html)
+        report, _ = build()
+        self.assertEqual(len(report.rebuilt), 0)
+        self.write(os.path.join(self.static, 'images', 'a.png'), png(800, 600))
+        report, html = build()
+        self.assertEqual(len(report.rebuilt), 1)
+        self.assertIn('width="800" height="600"', html)
+
+    def test_relative_image_in_subdirectory(self):
+        content = os.path.join(self.tmp.name, 'content')
+        public = os.path.join(self.tmp.name, 'public')
+        template = os.path.join(self.tmp.name, 'template.html')
+        self.write(os.path.join(content, 'rel', 'index.md'), b'# Rel\n\n![A](../images/a.png)')
+        self.write(template, b'{{ Content }}')
+        sizes, _ = self.probe()
+        generate_pages_recursive(content, template, public, image_sizes=sizes)
+        with open(os.path.join(public, 'rel', 'index.html')) as file:
+            self.assertIn('src="../images/a.png" alt="A" width="640" height="480"', file.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
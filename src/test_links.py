@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import links
+from links import BrokenLink, build_routes, check_links, markdown_links, resolve
+from site_generation import generate_pages_recursive, sync_dir
+
+
+class TestResolve(unittest.TestCase):
+    def test_resolve(self):
+        self.assertEqual(resolve("/blog/", "/"), "/blog/")
+        self.assertEqual(resolve("post.html#top", "/blog/"), "/blog/post.html")
+        self.assertEqual(resolve("../images/a%20b.png?v=1", "/blog/post.html"), "/images/a b.png")
+        self.assertEqual(resolve("./", "/blog/post.html"), "/blog/")
+        for url in ("https://example.com/", "//cdn.example.com/x.js", "mailto:me@example.com", "#top", ""):
+            self.assertIsNone(resolve(url, "/"))
+
+    def test_markdown_links_skip_code(self):
+        lines = ["# Title", "", "See [a](/a) and ![b](/b.png) but not `[c](/c)`", "```", "[d](/d)", "```",
+                 "[e](/e)"]
+        self.assertEqual(list(markdown_links(lines)), [(3, "/a"), (3, "/b.png"), (7, "/e")])
+
+    def test_markdown_links_follow_renderer(self):
+        lines = ["A paragraph", "over [two](/two) lines, **[bold](/bold)**", "", "- [one](/one)", "- [wiki](/w_(x))",
+                 "", "[see [1]](/see)"]
+        self.assertEqual(list(markdown_links(lines)), [(2, "/two"), (4, "/one"), (5, "/w_(x)"), (7, "/see")])
+
+    def test_build_routes(self):
+        with tempfile.TemporaryDirectory() as root:
+            for rel_path in ("index.html", "blog/index.html", "blog/post.html", "images/a.png"):
+                path = os.path.join(root, *rel_path.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, "w").close()
+            self.assertEqual(build_routes(root), {
+                "/", "/index.html", "/blog", "/blog/", "/blog/index.html", "/blog/post.html", "/images/a.png",
+            })
+
+
+class TestCheckLinks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        self.links = os.path.join(root, "cache", "links.json")
+        self.manifest = os.path.join(root, "cache", "manifest.json")
+        self.write(self.template, '<link href="/index.css">\n<title>{{ Title }}</title>{{ Content }}')
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Blog](/blog) and [post](blog/post.html)")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\n![A](../images/a.png)")
+        self.write(os.path.join(self.content, "blog", "post.md"),
+                   "# Post\n\n[home](/)\n\n[gone](/blog/old.html) and [out](https://example.com/)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def read_page(self, *parts):
+        with open(os.path.join(self.public, *parts)) as file:
+            return file.read()
+
+    def build(self, fingerprint=False):
+        report = sync_dir(self.static, self.public, self.manifest, fingerprint=fingerprint)
+        generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                 asset_map=report.asset_map)
+        return check_links(self.content, self.public, self.template, self.links, self.manifest)
+
+    def test_broken_links_reported_with_line(self):
+        report = self.build()
+        self.assertEqual(report.broken, [BrokenLink(os.path.join(self.content, "blog", "post.md"), 5,
+                                                    "/blog/old.html")])
+        self.assertEqual(report.checked, 6)
+        self.assertIn("post.md:5: broken link /blog/old.html", report.summary())
+
+    def test_fingerprinted_assets(self):
+        self.write(os.path.join(self.content, "gallery.md"), "# Gallery\n\n[full image](images/a.png)")
+        report = self.build(fingerprint=True)
+        self.assertEqual([link.url for link in report.broken], ["/blog/old.html"])
+        self.assertEqual(report.checked, 7)
+        with open(os.path.join(self.public, "asset-manifest.json")) as file:
+            self.assertIn("/index.css", json.load(file))
+
+    def test_fingerprinted_assets_checked_as_written(self):
+        # relative template URLs are not rewritten, so they name the original file, which is not copied
+        self.write(self.template, '<link href="index.css">\n<title>{{ Title }}</title>{{ Content }}')
+        report = self.build(fingerprint=True)
+        self.assertEqual(sorted(link.url for link in report.broken), ["/blog/old.html", "index.css"])
+        self.assertIn('href="index.css"', self.read_page("index.html"))
+
+    def test_removed_page_breaks_links_to_it(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        report = self.build()
+        self.assertEqual(sorted(link.url for link in report.broken), ["/blog", "/blog/old.html"])
+
+    def test_only_changed_pages_scanned(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[missing](/missing.html)")
+        with mock.patch.object(links, "markdown_links", wraps=links.markdown_links) as scan:
+            report = self.build()
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual(report.scanned, [os.path.join(self.content, "index.md")])
+        self.assertEqual(sorted(link.url for link in report.broken), ["/blog/old.html", "/missing.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from page_cache import PageCache
+from search import page_terms
+from site_generation import PARALLEL_MIN_PAGES, generate_pages_recursive
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "pages")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_and_get(self):
+        cache = PageCache(self.root, "v1")
+        self.assertIsNone(cache.get("ab12"))
+        cache.put("ab12", "Title", "<div><p>body</p></div>")
+        self.assertEqual(cache.get("ab12"), ("Title", "<div><p>body</p></div>", None))
+        cache.put("cd34", "Title", "<div><p>body</p></div>", Counter(body=1))
+        self.assertEqual(cache.get("cd34"), ("Title", "<div><p>body</p></div>", Counter(body=1)))
+
+    def test_versions_are_separate(self):
+        PageCache(self.root, "v1").put("ab12", "Title", "<div></div>")
+        self.assertIsNone(PageCache(self.root, "v2").get("ab12"))
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = PageCache(self.root, "v1")
+        cache.put("ab12", "Title", "<div></div>")
+        with open(cache.entry_path("ab12"), "wb") as file:
+            file.write(b"garbage")
+        self.assertIsNone(cache.get("ab12"))
+
+    def test_trim_removes_other_versions(self):
+        PageCache(self.root, "v1").put("ab12", "Title", "<div></div>")
+        cache = PageCache(self.root, "v2")
+        cache.put("cd34", "Title", "<div></div>")
+        cache.trim()
+        self.assertEqual(os.listdir(self.root), [os.path.basename(cache.directory)])
+
+    def test_trim_evicts_least_recently_used(self):
+        cache = PageCache(self.root, "v1")
+        for i, key in enumerate(("aa01", "bb02", "cc03")):
+            cache.put(key, "Title", "x" * 1000 + key)
+            os.utime(cache.entry_path(key), ns=(i * 10**9, i * 10**9))
+        cache.get("aa01")
+        sizes = [size for _, size, _ in cache.entries()]
+        cache.max_bytes = sum(sizes) - 1
+        self.assertEqual(cache.trim(), 1)
+        self.assertIsNone(cache.get("bb02"))
+        self.assertIsNotNone(cache.get("aa01"))
+        self.assertIsNotNone(cache.get("cc03"))
+
+
+class CountingPageCache(PageCache):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.hits = 0
+
+    def get(self, key):
+        cached = super().get(key)
+        if cached is not None:
+            self.hits += 1
+        return cached
+
+
+class TestBuildWithPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, "cache", "manifest.json")
+        self.cache_dir = os.path.join(self.root, "cache", "pages")
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        for i in range(PARALLEL_MIN_PAGES + 2):
+            path = os.path.join(self.content, f"page{i}.md")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(f"# Page {i}\n\nSome **bold** text\n\n> a quote")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, root):
+        tree = {}
+        for name in os.listdir(root):
+            with open(os.path.join(root, name)) as file:
+                tree[name] = file.read()
+        return tree
+
+    def test_template_change_reuses_parsed_pages(self):
+        public = os.path.join(self.root, "public")
+        generate_pages_recursive(self.content, self.template, public, self.manifest,
+                                 page_cache=PageCache(self.cache_dir, "v1"))
+        with open(self.template, "w") as file:
+            file.write("<h1>{{ Title }}</h1>{{ Content }}")
+        cache = CountingPageCache(self.cache_dir, "v1")
+        report = generate_pages_recursive(self.content, self.template, public, self.manifest, page_cache=cache)
+        self.assertEqual(len(report.rebuilt), PARALLEL_MIN_PAGES + 2)
+        self.assertEqual(cache.hits, PARALLEL_MIN_PAGES + 2)
+
+        uncached = os.path.join(self.root, "uncached")
+        generate_pages_recursive(self.content, self.template, uncached)
+        self.assertEqual(self.read_tree(public), self.read_tree(uncached))
+
+    def test_parallel_build_shares_cache(self):
+        cache = PageCache(self.cache_dir, "v1")
+        first = os.path.join(self.root, "first")
+        second = os.path.join(self.root, "second")
+        generate_pages_recursive(self.content, self.template, first, jobs=4, page_cache=cache)
+        self.assertEqual(len(cache.entries()), PARALLEL_MIN_PAGES + 2)
+        generate_pages_recursive(self.content, self.template, second, jobs=4, page_cache=cache)
+        self.assertEqual(self.read_tree(first), self.read_tree(second))
+
+    def test_terms_kept_with_pages(self):
+        public = os.path.join(self.root, "public")
+        generate_pages_recursive(self.content, self.template, public, page_cache=PageCache(self.cache_dir, "v1"))
+        # entries stored without terms are tokenized once and then kept with them
+        for jobs in (4, 1):
+            cache = CountingPageCache(self.cache_dir, "v1")
+            report = generate_pages_recursive(self.content, self.template, public, jobs=jobs, page_cache=cache,
+                                              collect_terms=True)
+            for src_path, terms in report.terms.items():
+                self.assertEqual((terms.title, terms.counts), page_terms(src_path))
+        self.assertEqual(cache.hits, PARALLEL_MIN_PAGES + 2)
+        for _, _, path in cache.entries():
+            _, _, counts = cache.get(os.path.basename(path))
+            self.assertEqual(counts["bold"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
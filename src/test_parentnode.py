@@ -1,3 +1,4 @@
+import io
 import unittest
 from htmlnode import ParentNode, LeafNode
 
@@ -99,6 +100,30 @@ class TestParentNode(unittest.TestCase):
         )
         expected_html = "<div><section><article><p>Deep nested</p></article></section></div>"
         self.assertEqual(node.to_html(), expected_html)
+    def test_iter_html_matches_to_html(self):
+        node = ParentNode(
+            tag="div",
+            children=[
+                LeafNode("Text", "p"),
+                ParentNode(tag="section", children=[LeafNode("Nested Text", "span")]),
+            ]
+        )
+        fragments = list(node.iter_html())
+        self.assertGreater(len(fragments), 1)
+        self.assertEqual("".join(fragments), node.to_html())
+
+    def test_write_html(self):
+        node = ParentNode("ul", [LeafNode("one", "li"), LeafNode("two", "li")])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), "<ul><li>one</li><li>two</li></ul>")
+
+    def test_iter_html_deep_tree(self):
+        node = LeafNode("leaf", "b")
+        for _ in range(200):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 200 + "<b>leaf</b>"))
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
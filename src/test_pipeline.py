@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from pipeline import run_pipeline
+from site_generation import BuildError, RenderOptions, generate_pages_recursive
+from template import Template
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        self.pages = []
+        for i in range(20):
+            path = os.path.join(self.content, f"dir{i % 4}", f"page{i}.md")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(f"# Page {i}\n\nSome **bold** text\n\n1. one\n2. two")
+            self.pages.append((path, os.path.join(self.root, "out", f"dir{i % 4}", f"page{i}.html")))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                with open(path) as file:
+                    tree[os.path.relpath(path, root)] = file.read()
+        return tree
+
+    def test_matches_serial_build(self):
+        serial = os.path.join(self.root, "serial")
+        generate_pages_recursive(self.content, self.template, serial)
+        for jobs in (1, 2):
+            out = os.path.join(self.root, f"async{jobs}")
+            report = generate_pages_recursive(self.content, self.template, out, jobs=jobs, async_io=True)
+            self.assertEqual(len(report.rebuilt), 20)
+            self.assertEqual(self.read_tree(out), self.read_tree(serial))
+
+    def test_small_queue(self):
+        results = run_pipeline(self.pages, RenderOptions(Template(TEMPLATE)), queue_size=1)
+        self.assertEqual(results, [(True, None)] * 20)
+        self.assertTrue(all(os.path.isfile(dst_path) for _, dst_path in self.pages))
+        results = run_pipeline(self.pages, RenderOptions(Template(TEMPLATE)), queue_size=1)
+        self.assertEqual(results, [(False, None)] * 20)
+
+    def test_errors_in_page_order(self):
+        os.remove(self.pages[3][0])
+        with open(self.pages[1][0], "w") as file:
+            file.write("no heading")
+        errors = [error for _, error in run_pipeline(self.pages, RenderOptions(Template(TEMPLATE)), queue_size=2)]
+        self.assertTrue(errors[1].startswith("Exception: No Header!"))
+        self.assertTrue(errors[3].startswith("FileNotFoundError"))
+        self.assertEqual([i for i, error in enumerate(errors) if error], [1, 3])
+
+    def test_build_error_from_pipeline(self):
+        with open(self.pages[5][0], "w") as file:
+            file.write("no heading")
+        with self.assertRaises(BuildError) as ctx:
+            generate_pages_recursive(self.content, self.template, os.path.join(self.root, "out"), async_io=True)
+        self.assertEqual([path for path, _ in ctx.exception.failures], [self.pages[5][0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
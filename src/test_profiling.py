@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import site_generation
+from profiling import BuildProfiler, STAGES
+from site_generation import generate_pages_recursive
+
+
+class TestBuildProfiler(unittest.TestCase):
+    def test_stage_records_event_and_totals(self):
+        profiler = BuildProfiler()
+        with profiler.stage("a.md", "parse"):
+            pass
+        with profiler.stage("a.md", "parse"):
+            pass
+        self.assertEqual(len(profiler.events), 2)
+        self.assertEqual(profiler.events[0]["ph"], "X")
+        self.assertEqual(profiler.events[0]["args"], {"page": "a.md"})
+        self.assertEqual(list(profiler.page_stages["a.md"]), ["parse"])
+
+    def test_slowest_sorted(self):
+        profiler = BuildProfiler()
+        profiler.page_stages = {"fast.md": {"parse": 0.001}, "slow.md": {"parse": 0.5, "write": 0.1}}
+        slowest = profiler.slowest(1)
+        self.assertEqual(slowest[0][0], "slow.md")
+        self.assertAlmostEqual(slowest[0][1], 0.6)
+        self.assertIn("slow.md", profiler.report(1))
+        self.assertNotIn("fast.md", profiler.report(1))
+
+    def test_profiled_build(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            os.makedirs(content)
+            page = os.path.join(content, "index.md")
+            with open(page, "w") as file:
+                file.write("# Home\n\nSome **text**")
+            template = os.path.join(root, "template.html")
+            with open(template, "w") as file:
+                file.write("<title>{{ Title }}</title>{{ Content }}")
+            cprofile_path = os.path.join(root, "page.prof")
+            profiler = BuildProfiler(page, cprofile_path)
+
+            generate_pages_recursive(content, template, os.path.join(root, "public"), jobs=4, profiler=profiler)
+
+            self.assertEqual(set(profiler.page_stages[page]), set(STAGES))
+            self.assertTrue(os.path.exists(cprofile_path))
+            trace_path = os.path.join(root, "trace.json")
+            profiler.write_trace(trace_path)
+            with open(trace_path) as file:
+                trace = json.load(file)
+            self.assertEqual(len(trace["traceEvents"]), len(STAGES))
+            with open(os.path.join(root, "public", "index.html")) as file:
+                self.assertEqual(file.read(), "<title>Home</title><div><h1>Home</h1><p>Some <b>text</b></p></div>")
+
+    def test_profiled_large_page_streams(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            os.makedirs(content)
+            page = os.path.join(content, "index.md")
+            with open(page, "w") as file:
+                file.write("# Home\n\nSome **text**")
+            template = os.path.join(root, "template.html")
+            with open(template, "w") as file:
+                file.write("<title>{{ Title }}</title>{{ Content }}")
+            cprofile_path = os.path.join(root, "page.prof")
+            profiler = BuildProfiler(page, cprofile_path)
+
+            with mock.patch.object(site_generation, "STREAM_MIN_BYTES", 0), \
+                    mock.patch.object(site_generation, "_render_page_profiled", side_effect=AssertionError):
+                generate_pages_recursive(content, template, os.path.join(root, "public"), profiler=profiler)
+
+            self.assertEqual(list(profiler.page_stages[page]), ["write"])
+            self.assertTrue(os.path.exists(cprofile_path))
+            with open(os.path.join(root, "public", "index.html")) as file:
+                self.assertEqual(file.read(), "<title>Home</title><div><h1>Home</h1><p>Some <b>text</b></p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+import search
+import site_generation
+from block_cache import BlockCache
+from search import page_terms, page_url, update_search_index
+from site_generation import PARALLEL_MIN_PAGES, generate_pages_recursive
+from terms import tokenize
+
+
+class TestTerms(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(list(tokenize("The Hobbit, or There and Back Again (1937) a")),
+                         ["the", "hobbit", "or", "there", "and", "back", "again", "1937"])
+
+    def test_page_terms_skip_markup(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "page.md")
+            with open(path, "w") as file:
+                file.write("# Middle Earth\n\nA **bold** [link](https://example.com/hidden) to Earth\n\n"
+                           "![alt text](/images/secret.png)")
+            title, terms = page_terms(path)
+        self.assertEqual(title, "Middle Earth")
+        self.assertEqual(terms["earth"], 2)
+        self.assertEqual(terms["bold"], 1)
+        self.assertEqual(terms["link"], 1)
+        self.assertNotIn("example", terms)
+        self.assertNotIn("secret", terms)
+
+    def test_text_like_markup_counted(self):
+        # the renderer writes text unescaped, so x<y and z>w reads as a tag in the HTML
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(content)
+            path = os.path.join(content, "index.md")
+            with open(path, "w") as file:
+                file.write("# Logic\n\nif x<y and z>w then done")
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as file:
+                file.write("{{ Content }}")
+            expected = {"logic": 1, "if": 1, "and": 1, "then": 1, "done": 1}
+            _, terms = page_terms(path)
+            self.assertEqual({term: terms[term] for term in expected}, expected)
+            public = os.path.join(tmp, "public")
+            # a block cached by a build that did not count terms is parsed again to count them
+            uncounted = BlockCache()
+            generate_pages_recursive(content, template, public, block_cache=uncounted)
+            for block_cache in (None, BlockCache(), uncounted):
+                report = generate_pages_recursive(content, template, public, block_cache=block_cache,
+                                                  collect_terms=True)
+                self.assertEqual(report.terms[path].counts, terms)
+
+    def test_page_url(self):
+        self.assertEqual(page_url(os.path.join("public", "index.html"), "public"), "/")
+        self.assertEqual(page_url(os.path.join("public", "blog", "index.html"), "public"), "/blog/")
+        self.assertEqual(page_url(os.path.join("public", "blog", "post.html"), "public"), "/blog/post.html")
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.public = os.path.join(root, "public")
+        self.terms = os.path.join(root, "cache", "search-terms.json")
+        self.manifest = os.path.join(root, "cache", "manifest.json")
+        self.template = os.path.join(root, "template.html")
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        self.write("index.md", "# Home\n\nWelcome to the shire")
+        self.write("blog/index.md", "# Blog\n\nShire news and more shire news")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.content, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self):
+        generate_pages_recursive(self.content, self.template, self.public, self.manifest)
+        return update_search_index(self.content, self.public, self.terms, self.manifest)
+
+    def read(self, name):
+        with open(os.path.join(self.public, "search", name)) as file:
+            return json.load(file)
+
+    def lookup(self, term):
+        index = self.read("index.json")
+        postings = self.read(term[:index["prefix_length"]] + ".json").get(term, [])
+        return {index["pages"][page_id][0]: count for page_id, count in zip(postings[::2], postings[1::2])}
+
+    def test_index(self):
+        report = self.build()
+        self.assertEqual(len(report.tokenized), 2)
+        index = self.read("index.json")
+        self.assertEqual(index["pages"], [["/", "Home"], ["/blog/", "Blog"]])
+        self.assertEqual(self.lookup("shire"), {"/": 1, "/blog/": 2})
+        self.assertEqual(self.lookup("news"), {"/blog/": 2})
+        self.assertIn("sh", index["shards"])
+
+    def test_only_changed_pages_tokenized(self):
+        self.build()
+        self.write("blog/index.md", "# Blog\n\nNothing about hobbits")
+        with mock.patch.object(search, "page_terms", wraps=search.page_terms) as terms:
+            report = self.build()
+        terms.assert_called_once_with(os.path.join(self.content, "blog/index.md"))
+        self.assertEqual(len(report.unchanged), 1)
+        self.assertEqual(self.lookup("shire"), {"/": 1})
+        self.assertEqual(self.lookup("hobbits"), {"/blog/": 1})
+        # no term starting with "ne" is left
+        self.assertFalse(os.path.exists(os.path.join(self.public, "search", "ne.json")))
+
+    def test_terms_counted_while_rendering(self):
+        report = generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                          collect_terms=True)
+        self.assertEqual(len(report.terms), 2)
+        with mock.patch.object(search, "page_terms") as terms:
+            search_report = update_search_index(self.content, self.public, self.terms, self.manifest,
+                                                rendered=report.terms)
+        terms.assert_not_called()
+        self.assertEqual(len(search_report.tokenized), 2)
+        self.assertEqual(self.lookup("shire"), {"/": 1, "/blog/": 2})
+
+        # a rebuild that skips every page leaves the cached terms in place
+        report = generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                          collect_terms=True)
+        self.assertEqual(report.terms, {})
+        search_report = update_search_index(self.content, self.public, self.terms, self.manifest,
+                                            rendered=report.terms)
+        self.assertEqual(len(search_report.unchanged), 2)
+
+    def test_rendered_terms_match_page_terms(self):
+        for i in range(PARALLEL_MIN_PAGES):
+            self.write(f"posts/{i}.md", f"# Post {i}\n\nA **bold** [link](/x) and `code` <here>\n\n"
+                                        f"- one\n- two {i}\n\n```\nfenced words\n```")
+        runs = [{}, {"jobs": 2}, {"async_io": True}, {"async_io": True, "jobs": 2}]
+        for options in runs:
+            out = os.path.join(self.tmp.name, f"out{len(os.listdir(self.tmp.name))}")
+            report = generate_pages_recursive(self.content, self.template, out, collect_terms=True, **options)
+            self.assertEqual(len(report.terms), PARALLEL_MIN_PAGES + 2)
+            for src_path, terms in report.terms.items():
+                self.assertEqual((terms.title, terms.counts), page_terms(src_path), options)
+        # streamed pages count their terms too
+        with mock.patch.object(site_generation, "STREAM_MIN_BYTES", 0):
+            report = generate_pages_recursive(self.content, self.template, os.path.join(self.tmp.name, "big"),
+                                              collect_terms=True)
+        for src_path, terms in report.terms.items():
+            self.assertEqual((terms.title, terms.counts), page_terms(src_path))
+
+    def test_removed_page(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog/index.md"))
+        report = self.build()
+        self.assertEqual(report.removed, [os.path.join(self.content, "blog/index.md")])
+        self.assertEqual(self.read("index.json")["pages"], [["/", "Home"]])
+        self.assertEqual(self.lookup("shire"), {"/": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import threading
+import unittest
+from serve import PollingWatcher, ReloadBroadcaster, changed_paths
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def test_detects_added_changed_and_removed_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            kept = os.path.join(root, "kept.md")
+            removed = os.path.join(root, "removed.md")
+            for path in (kept, removed):
+                with open(path, "w") as file:
+                    file.write("# Page")
+            watcher = PollingWatcher([root])
+            self.assertEqual(watcher.poll(), [])
+
+            added = os.path.join(root, "sub", "added.md")
+            os.makedirs(os.path.dirname(added))
+            with open(added, "w") as file:
+                file.write("# New")
+            with open(kept, "a") as file:
+                file.write("\n\nmore")
+            os.remove(removed)
+            self.assertEqual(watcher.poll(), sorted([kept, removed, added]))
+            self.assertEqual(watcher.poll(), [])
+
+    def test_changed_paths(self):
+        before = {"a": (1, 1), "b": (1, 1)}
+        after = {"a": (1, 1), "b": (2, 1), "c": (1, 1)}
+        self.assertEqual(changed_paths(before, after), ["b", "c"])
+
+
+class TestReloadBroadcaster(unittest.TestCase):
+    def test_wait_returns_on_notify(self):
+        broadcaster = ReloadBroadcaster()
+        threading.Timer(0.05, broadcaster.notify).start()
+        self.assertEqual(broadcaster.wait(0, 5), 1)
+
+    def test_wait_times_out(self):
+        broadcaster = ReloadBroadcaster()
+        self.assertEqual(broadcaster.wait(0, 0.01), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
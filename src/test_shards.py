@@ -0,0 +1,132 @@
+import filecmp
+import os
+import tempfile
+import unittest
+from shards import MergeError, merge_shards, parse_shard, shard_path
+from site_generation import BuildError, generate_pages_recursive, shard_of, sync_dir
+
+
+class TestShardNames(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("1/4"), (0, 4))
+        self.assertEqual(parse_shard("4/4"), (3, 4))
+        for text in ("0/4", "5/4", "1", "a/b", "1/2/3"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+    def test_shard_path(self):
+        self.assertEqual(shard_path("public", (0, 4)), "public.shard-1-of-4")
+        self.assertEqual(shard_path(os.path.join(".ssg-cache", "manifest.json"), (2, 4)),
+                         os.path.join(".ssg-cache", "manifest.shard-3-of-4.json"))
+
+    def test_shard_of_is_stable(self):
+        paths = [f"blog/post-{number}.md" for number in range(200)]
+        shards = [shard_of(path, 4) for path in paths]
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertEqual(shards, [shard_of(path, 4) for path in paths])
+
+
+class TestShardedBuild(unittest.TestCase):
+    COUNT = 3
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.template = os.path.join(root, "template.html")
+        self.public = os.path.join(root, "public")
+        self.manifest = os.path.join(root, "cache", "manifest.json")
+        with open(self.template, "w") as file:
+            file.write("<title>{{ Title }}</title>{{ Content }}")
+        for number in range(12):
+            self.write(self.content, f"section-{number % 3}/page-{number}.md", f"# Page {number}\n\nText {number}")
+        self.write(self.static, "index.css", "body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, root, rel_path, text):
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def shards(self):
+        return [(shard_path(self.public, (index, self.COUNT)), shard_path(self.manifest, (index, self.COUNT)))
+                for index in range(self.COUNT)]
+
+    def build_shard(self, index):
+        output_dir, manifest_path = self.shards()[index]
+        sync_dir(self.static, output_dir, manifest_path)
+        return generate_pages_recursive(self.content, self.template, output_dir, manifest_path,
+                                        shard=(index, self.COUNT))
+
+    def test_merge_matches_unsharded_build(self):
+        built = [len(self.build_shard(index).rebuilt) for index in range(self.COUNT)]
+        self.assertEqual(sum(built), 12)
+        report = merge_shards(self.shards(), self.public, self.manifest)
+        self.assertEqual(report.pages, 12)
+
+        whole = os.path.join(self.tmp.name, "whole")
+        sync_dir(self.static, whole)
+        generate_pages_recursive(self.content, self.template, whole)
+        comparison = filecmp.dircmp(whole, self.public)
+        self.assertEqual(comparison.left_only + comparison.right_only + comparison.diff_files, [])
+        for section in ("section-0", "section-1", "section-2"):
+            sub = comparison.subdirs[section]
+            self.assertEqual(sub.left_only + sub.right_only + sub.diff_files, [])
+
+    def test_merge_removes_deleted_pages(self):
+        for index in range(self.COUNT):
+            self.build_shard(index)
+        merge_shards(self.shards(), self.public, self.manifest)
+        os.remove(os.path.join(self.content, "section-0", "page-0.md"))
+        for index in range(self.COUNT):
+            self.build_shard(index)
+        report = merge_shards(self.shards(), self.public, self.manifest)
+        self.assertEqual(report.removed, [os.path.join(self.public, "section-0", "page-0.html")])
+        self.assertEqual(len(report.copied), 0)
+
+    def test_missing_shard(self):
+        for index in range(self.COUNT - 1):
+            self.build_shard(index)
+        with self.assertRaises(MergeError) as raised:
+            merge_shards(self.shards(), self.public, self.manifest)
+        self.assertEqual(len(raised.exception.conflicts), 1)
+        self.assertFalse(os.path.exists(self.public))
+
+    def test_failed_page_is_missing(self):
+        self.write(self.content, "broken.md", "no title here")
+        failed = None
+        for index in range(self.COUNT):
+            try:
+                self.build_shard(index)
+            except BuildError:
+                failed = index
+        self.assertIsNotNone(failed)
+        with self.assertRaises(MergeError) as raised:
+            merge_shards(self.shards(), self.public, self.manifest)
+        self.assertEqual(raised.exception.missing, [os.path.join(self.content, "broken.md")])
+
+    def test_conflicting_files(self):
+        for index in range(self.COUNT):
+            self.build_shard(index)
+        self.write(self.shards()[1][0], "index.css", "body { color: red }")
+        with self.assertRaises(MergeError) as raised:
+            merge_shards(self.shards(), self.public, self.manifest)
+        self.assertEqual(len(raised.exception.conflicts), 1)
+        self.assertIn("index.css", raised.exception.conflicts[0])
+
+    def test_content_changed_between_shards(self):
+        self.build_shard(0)
+        self.write(self.content, "new.md", "# New")
+        for index in range(1, self.COUNT):
+            self.build_shard(index)
+        with self.assertRaises(MergeError) as raised:
+            merge_shards(self.shards(), self.public, self.manifest)
+        self.assertTrue(any("different content" in conflict for conflict in raised.exception.conflicts))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,373 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import site_generation
+from build_manifest import BuildManifest
+from compress import compress_tree
+from images import probe_images
+from site_generation import (BuildError, PARALLEL_MIN_PAGES, find_pages, generate_pages_recursive, sync_dir,
+                             why_rebuilt, write_page)
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest = os.path.join(self.root, "cache", "manifest.json")
+        self.write("template.html", TEMPLATE)
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/post.md", "# Post\n\nSome *text*")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def build(self, changed_paths=None):
+        return generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                        changed_paths=changed_paths)
+
+    def test_find_pages_sorted(self):
+        self.write("content/blog.md", "# Blog")
+        pages = find_pages(self.content, self.public)
+        self.assertEqual(pages, [
+            (os.path.join(self.content, "blog.md"), os.path.join(self.public, "blog.html")),
+            (os.path.join(self.content, "blog", "post.md"), os.path.join(self.public, "blog", "post.html")),
+            (os.path.join(self.content, "index.md"), os.path.join(self.public, "index.html")),
+        ])
+        self.assertEqual(pages, sorted(pages))
+
+    def test_second_build_skips_everything(self):
+        first = self.build()
+        self.assertEqual(len(first.rebuilt), 2)
+        second = self.build()
+        self.assertEqual(second.rebuilt, [])
+        self.assertEqual(len(second.skipped), 2)
+
+    def test_changed_source_rebuilds_only_that_page(self):
+        self.build()
+        self.write("content/index.md", "# Home\n\nWelcome back")
+        report = self.build()
+        self.assertEqual(report.rebuilt, [os.path.join(self.public, "index.html")])
+        with open(os.path.join(self.public, "index.html")) as file:
+            self.assertIn("Welcome back", file.read())
+
+    def test_template_change_rebuilds_all(self):
+        self.build()
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        report = self.build()
+        self.assertEqual(len(report.rebuilt), 2)
+
+    def test_deleted_output_is_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        report = self.build()
+        self.assertEqual(report.rebuilt, [os.path.join(self.public, "index.html")])
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        report = self.build()
+        self.assertEqual(report.removed, [os.path.join(self.public, "blog", "post.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+
+    def test_dependency_graph_records_inputs(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest)
+        index = os.path.join(self.content, "index.md")
+        self.assertEqual(sorted(manifest.pages[index]["deps"]), sorted([index, self.template]))
+        self.assertEqual(manifest.dependents([index]), {index})
+        self.assertEqual(len(manifest.dependents([self.template])), 2)
+
+    def test_shared_manifest_saved_by_caller(self):
+        self.write("static/robots.txt", "User-agent: *")
+        static = os.path.join(self.root, "static")
+        manifest = BuildManifest.load(self.manifest)
+        with mock.patch.object(BuildManifest, "save") as save:
+            sync_dir(static, self.public, manifest=manifest)
+            probe_images(static, os.path.join(self.root, "cache", "sizes.json"), manifest=manifest)
+            generate_pages_recursive(self.content, self.template, self.public, manifest=manifest)
+            compress_tree(self.public, min_size=0, manifest=manifest)
+        save.assert_not_called()
+        self.assertFalse(os.path.exists(self.manifest))
+        manifest.save()
+
+        saved = BuildManifest.load(self.manifest)
+        self.assertEqual(saved.assets, [os.path.join(self.public, "robots.txt")])
+        self.assertEqual(len(saved.sidecars), 3)
+        self.assertEqual(len(self.build().skipped), 2)
+
+    def test_changed_paths_limit_the_pages_looked_at(self):
+        self.build()
+        index = os.path.join(self.content, "index.md")
+        post = os.path.join(self.content, "blog", "post.md")
+        self.write("content/index.md", "# Home\n\nWelcome back")
+        self.write("content/blog/post.md", "# Post\n\nEdited")
+        report = self.build(changed_paths=[post])
+        self.assertEqual(report.rebuilt, [os.path.join(self.public, "blog", "post.html")])
+        report = self.build(changed_paths=[index])
+        self.assertEqual(report.rebuilt, [os.path.join(self.public, "index.html")])
+
+    def test_changed_paths_absolute(self):
+        # the manifest records paths as given, here relative to the build root; watchers report absolute ones
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        generate_pages_recursive("content", "template.html", "public", self.manifest)
+        self.write("content/blog/post.md", "# Post\n\nEdited")
+        report = generate_pages_recursive("content", "template.html", "public", self.manifest,
+                                          changed_paths=[os.path.join(self.root, "content", "blog", "post.md")])
+        self.assertEqual(report.rebuilt, [os.path.join("public", "blog", "post.html")])
+        manifest = BuildManifest.load(self.manifest)
+        self.assertEqual(manifest.dependents([self.template]), {os.path.join("content", "index.md"),
+                                                                os.path.join("content", "blog", "post.md")})
+
+    def test_changed_paths_include_new_pages(self):
+        self.build()
+        self.write("content/new.md", "# New")
+        report = self.build(changed_paths=[os.path.join(self.content, "new.md")])
+        self.assertEqual(report.rebuilt, [os.path.join(self.public, "new.html")])
+
+    def test_why_rebuilt(self):
+        self.build()
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        text = why_rebuilt(self.manifest, os.path.join(self.public, "index.html"))
+        self.assertIn(f"because: {self.template} changed", text)
+        self.assertIn(os.path.join(self.content, "index.md"), text)
+        self.write("content/index.md", "# Home\n\nWelcome back")
+        text = why_rebuilt(self.manifest, os.path.join(self.content, "index.md"))
+        self.assertIn("(changed since)", text)
+        with self.assertRaises(ValueError):
+            why_rebuilt(self.manifest, "missing.md")
+
+    def test_identical_output_is_not_rewritten(self):
+        self.build()
+        index = os.path.join(self.public, "index.html")
+        os.utime(index, ns=(0, 0))
+        # a new generator version forces every page to render again
+        manifest = BuildManifest.load(self.manifest)
+        manifest.version = "old"
+        manifest.save()
+        report = self.build()
+        self.assertEqual(len(report.rebuilt), 2)
+        self.assertEqual(len(report.unchanged), 2)
+        self.assertIn("(0 written, 2 unchanged)", report.summary())
+        self.assertEqual(os.stat(index).st_mtime_ns, 0)
+
+
+class TestWritePage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "out", "page.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read()
+
+    def test_write_then_skip(self):
+        self.assertTrue(write_page(self.path, "<p>hello</p>"))
+        self.assertFalse(write_page(self.path, "<p>hello</p>"))
+        self.assertFalse(write_page(self.path, iter(["<p>", "hello", "</p>"])))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["page.html"])
+
+    def test_changed_fragments(self):
+        write_page(self.path, "<p>hello</p><p>world</p>")
+        self.assertTrue(write_page(self.path, iter(["<p>hello</p>", "<p>there</p>", "<p>!</p>"])))
+        self.assertEqual(self.read(), "<p>hello</p><p>there</p><p>!</p>")
+
+    def test_shorter_and_longer(self):
+        write_page(self.path, "<p>hello</p>")
+        self.assertTrue(write_page(self.path, ["<p>hello</p>", "<p>more</p>"]))
+        self.assertEqual(self.read(), "<p>hello</p><p>more</p>")
+        self.assertTrue(write_page(self.path, ["<p>hello</p>"]))
+        self.assertEqual(self.read(), "<p>hello</p>")
+
+    def test_failed_render_keeps_old_file(self):
+        write_page(self.path, "<p>old</p>")
+
+        def fragments():
+            yield "<p>new"
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            write_page(self.path, fragments())
+        self.assertEqual(self.read(), "<p>old</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["page.html"])
+
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        for i in range(PARALLEL_MIN_PAGES + 4):
+            path = os.path.join(self.content, f"section{i % 3}", f"page{i}.md")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(f"# Page {i}\n\nSome **bold** text with a [link](/page{i})\n\n* one\n* two")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, root):
+        tree = {}
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as file:
+                    tree[os.path.relpath(path, root)] = file.read()
+        return tree
+
+    def test_parallel_output_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial)
+        report = generate_pages_recursive(self.content, self.template, parallel, jobs=4)
+        self.assertEqual(len(report.rebuilt), PARALLEL_MIN_PAGES + 4)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_failures_reported_in_page_order(self):
+        for name in ("page7.md", "page1.md"):
+            path = os.path.join(self.content, f"section{int(name[4]) % 3}", name)
+            with open(path, "w") as file:
+                file.write("no heading here")
+        for jobs in (1, 4):
+            with self.assertRaises(BuildError) as ctx:
+                generate_pages_recursive(self.content, self.template, os.path.join(self.root, f"out{jobs}"), jobs=jobs)
+            failed = [path for path, _ in ctx.exception.failures]
+            self.assertEqual(failed, [
+                os.path.join(self.content, "section1", "page1.md"),
+                os.path.join(self.content, "section1", "page7.md"),
+            ])
+
+
+class TestStreamingBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        with open(self.template, "w") as file:
+            file.write(TEMPLATE)
+        os.makedirs(self.content)
+        with open(os.path.join(self.content, "big.md"), "w") as file:
+            for i in range(200):
+                file.write(f"## Section {i}\n\nText with **bold** and `code`\n\n* a\n* b\n\n> quoted\n\n")
+            file.write("# Title at the end\n")
+        self.stream_min_bytes = site_generation.STREAM_MIN_BYTES
+
+    def tearDown(self):
+        site_generation.STREAM_MIN_BYTES = self.stream_min_bytes
+        self.tmp.cleanup()
+
+    def build(self, name, **kwargs):
+        out = os.path.join(self.root, name)
+        generate_pages_recursive(self.content, self.template, out, **kwargs)
+        with open(os.path.join(out, "big.html")) as file:
+            return file.read()
+
+    def test_streamed_page_matches_whole_page(self):
+        whole = self.build("whole")
+        site_generation.STREAM_MIN_BYTES = 1024
+        self.assertEqual(self.build("streamed"), whole)
+        self.assertEqual(self.build("async", async_io=True), whole)
+        self.assertTrue(whole.startswith("<title>Section 0</title>"))
+
+    def test_streamed_page_without_title(self):
+        with open(os.path.join(self.content, "big.md"), "w") as file:
+            file.write("no heading\n" * 200)
+        site_generation.STREAM_MIN_BYTES = 1024
+        with self.assertRaises(BuildError):
+            self.build("streamed")
+
+
+class TestSyncDir(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.static = os.path.join(self.root, "static")
+        self.public = os.path.join(self.root, "public")
+        self.manifest = os.path.join(self.root, "cache", "manifest.json")
+        self.write("static/index.css", "body {}")
+        self.write("static/images/a.png", "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def sync(self, checksum=False):
+        return sync_dir(self.static, self.public, self.manifest, checksum=checksum)
+
+    def test_first_sync_copies_everything(self):
+        report = self.sync()
+        self.assertEqual(sorted(report.copied), [
+            os.path.join(self.public, "images", "a.png"),
+            os.path.join(self.public, "index.css"),
+        ])
+        with open(os.path.join(self.public, "images", "a.png")) as file:
+            self.assertEqual(file.read(), "png")
+
+    def test_unchanged_files_are_not_copied(self):
+        self.sync()
+        report = self.sync()
+        self.assertEqual(report.copied, [])
+        self.assertEqual(len(report.unchanged), 2)
+        self.assertEqual(self.sync(checksum=True).copied, [])
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        self.write("static/index.css", "body { color: red }")
+        report = self.sync()
+        self.assertEqual(report.copied, [os.path.join(self.public, "index.css")])
+
+    def test_checksum_detects_same_size_edit(self):
+        self.sync()
+        path = os.path.join(self.static, "index.css")
+        stat = os.stat(path)
+        self.write("static/index.css", "bodY {}")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.sync().copied, [])
+        self.assertEqual(self.sync(checksum=True).copied, [os.path.join(self.public, "index.css")])
+
+    def test_touched_file_with_same_bytes_is_not_copied(self):
+        self.sync()
+        path = os.path.join(self.static, "index.css")
+        os.utime(path, ns=(0, 10**9))
+        report = self.sync()
+        self.assertEqual(report.copied, [])
+        self.assertEqual(os.stat(os.path.join(self.public, "index.css")).st_mtime_ns, 10**9)
+
+    def test_removes_only_synced_files(self):
+        self.write("public/index.html", "<p>page</p>")
+        self.sync()
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        report = self.sync()
+        self.assertEqual(report.removed, [os.path.join(self.public, "images", "a.png")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
+import time
 import unittest
 from textnode import TextNode
 from htmlnode import HTMLNode
 from textnode_enhancements import split_nodes_delimiter, split_nodes_image, split_nodes_link, text_to_textnodes
 from textnode_enhancements import markdown_to_blocks, block_to_block_type, markdown_to_html_node, extract_title
+from textnode_enhancements import BlockScanner, markdown_to_page
+from textnode_enhancements import LineBlockScanner, find_title_in_lines, iter_blocks_html
 
 
 class TestSplitNodesDelimiter(unittest.TestCase):
@@ -202,6 +205,63 @@ class TestTextToNodes(unittest.TestCase):
         result = text_to_textnodes(text)
         assert result == expected, f"Expected {expected}, but got {result}"
 
+    def test_text_to_textnodes_merges_text(self):
+        text = "empty **** pair"
+        expected = [TextNode("empty  pair", "text")]
+        result = text_to_textnodes(text)
+        assert result == expected, f"Expected {expected}, but got {result}"
+
+    def test_text_to_textnodes_mismatched(self):
+        with self.assertRaises(Exception):
+            text_to_textnodes("This is **not closed")
+        with self.assertRaises(Exception):
+            text_to_textnodes("This is `not closed")
+
+    def test_text_to_textnodes_code_keeps_asterisks(self):
+        text = "Use `a * b` here"
+        expected = [TextNode("Use ", "text"),
+                    TextNode("a * b", "code"),
+                    TextNode(" here", "text")]
+        result = text_to_textnodes(text)
+        assert result == expected, f"Expected {expected}, but got {result}"
+
+    def test_text_to_textnodes_many_links(self):
+        text = " ".join(f"[l{i}](u{i})" for i in range(50))
+        result = text_to_textnodes(text)
+        links = [node for node in result if node.text_type == "link"]
+        assert len(links) == 50
+        assert links[-1] == TextNode("l49", "link", "u49")
+
+    def test_text_to_textnodes_parenthesized_url(self):
+        text = "[Foo](https://en.wikipedia.org/wiki/Foo_(bar)) page"
+        expected = [TextNode("Foo", "link", "https://en.wikipedia.org/wiki/Foo_(bar)"),
+                    TextNode(" page", "text")]
+        result = text_to_textnodes(text)
+        assert result == expected, f"Expected {expected}, but got {result}"
+
+    def test_text_to_textnodes_bracketed_text(self):
+        text = "a [see [1]](u) b ![alt [x]](a.png)"
+        expected = [TextNode("a ", "text"),
+                    TextNode("see [1]", "link", "u"),
+                    TextNode(" b ", "text"),
+                    TextNode("alt [x]", "image", "a.png")]
+        result = text_to_textnodes(text)
+        assert result == expected, f"Expected {expected}, but got {result}"
+
+    def test_text_to_textnodes_unclosed_brackets_linear(self):
+        def best_time(n):
+            text = "[ [a] " * n + "(" * n
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                result = text_to_textnodes(text)
+                times.append(time.perf_counter() - start)
+            assert result == [TextNode(text, "text")]
+            return min(times)
+        # twice the text takes about twice as long; rescanning for every bracket would take four times
+        ratio = best_time(20000) / best_time(10000)
+        assert ratio < 3, f"doubling the input took {ratio:.1f}x as long"
+
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_simple_blocks(self):
         markdown = "# Heading\n\nParagraph 1\n\nParagraph 2"
@@ -375,9 +435,68 @@ class TestMarkdownToHtml(unittest.TestCase):
         blockquote_node = html_node.children[0]
         self.assertEqual(blockquote_node.tag, "blockquote")
         self.assertEqual(len(blockquote_node.children), 1)
-        p_node = blockquote_node.children[0]
-        self.assertEqual(p_node.tag, "p")
-        self.assertEqual(p_node.children[0].value, "This is a blockquote")
+        self.assertEqual(blockquote_node.children[0].value, "This is a blockquote")
+
+class TestBlockScanner(unittest.TestCase):
+    def test_typed_blocks(self):
+        markdown = "# Title\n\n* one\n* two\n\n```python\nprint(1)\n```\n\n### Sub"
+        blocks = list(BlockScanner(markdown))
+        self.assertEqual([block.block_type for block in blocks], ["heading", "unordered_list", "code", "heading"])
+        self.assertEqual(blocks[0].level, 1)
+        self.assertEqual(blocks[0].content, "Title")
+        self.assertEqual(blocks[1].items, ["one", "two"])
+        self.assertEqual(blocks[2].info, "python")
+        self.assertEqual(blocks[3].level, 3)
+
+    def test_line_numbers(self):
+        markdown = "# Title\n\n\nPara line 1\nPara line 2\n\n  \n> quote"
+        blocks = list(BlockScanner(markdown))
+        self.assertEqual([block.line for block in blocks], [1, 4, 8])
+
+    def test_title_captured(self):
+        scanner = BlockScanner("Intro paragraph\n## Second line heading\n\n# Later")
+        list(scanner)
+        self.assertEqual(scanner.title, "Second line heading")
+
+    def test_no_title(self):
+        scanner = BlockScanner("* not a title")
+        list(scanner)
+        self.assertIsNone(scanner.title)
+
+    def test_markdown_to_page(self):
+        title, node = markdown_to_page("# Hello\n\nWorld")
+        self.assertEqual(title, "Hello")
+        self.assertEqual(node.to_html(), "<div><h1>Hello</h1><p>World</p></div>")
+        with self.assertRaises(Exception):
+            markdown_to_page("no heading")
+
+    def test_crlf(self):
+        markdown = "# Title\r\n\r\nLine one\r\nLine two"
+        self.assertEqual(len(list(BlockScanner(markdown))), 2)
+
+class TestLineBlockScanner(unittest.TestCase):
+    MARKDOWN = ("Intro\n# Title\n\n\nPara **one**\nstill para\n\n  \n> quote\n\n"
+                "```\ncode\n```\n\n1. a\n2. b\n\n* x\n* y\n")
+
+    def test_same_blocks_as_block_scanner(self):
+        lines = self.MARKDOWN.splitlines(keepends=True)
+        self.assertEqual(list(LineBlockScanner(lines)), list(BlockScanner(self.MARKDOWN)))
+
+    def test_crlf_lines(self):
+        lines = "# Title\r\n\r\nLine one\r\nLine two".splitlines(keepends=True)
+        blocks = list(LineBlockScanner(lines))
+        self.assertEqual([block.text for block in blocks], ["# Title", "Line one\nLine two"])
+
+    def test_find_title_in_lines(self):
+        lines = self.MARKDOWN.splitlines(keepends=True)
+        self.assertEqual(find_title_in_lines(lines), "Title")
+        self.assertIsNone(find_title_in_lines(["no\n", "heading\n"]))
+
+    def test_iter_blocks_html(self):
+        lines = self.MARKDOWN.splitlines(keepends=True)
+        streamed = "".join(iter_blocks_html(LineBlockScanner(lines)))
+        self.assertEqual(streamed, markdown_to_html_node(self.MARKDOWN).to_html())
+        self.assertEqual("".join(iter_blocks_html([])), "<div></div>")
 
 class TestExtractTitle(unittest.TestCase):
     def test_extract_title_h1(self):
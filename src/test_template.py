@@ -0,0 +1,60 @@
+import os
+import pickle
+import tempfile
+import unittest
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template("<title> {{ Title }} </title><body>{{ Content }}</body>")
+        result = template.render({"Title": "Hello", "Content": "<p>World</p>"})
+        self.assertEqual(result, "<title> Hello </title><body><p>World</p></body>")
+
+    def test_segments_and_slots(self):
+        template = Template("a{{ X }}b{{Y}}c")
+        self.assertEqual(template.segments, ["a", "b", "c"])
+        self.assertEqual(template.slots, ["X", "Y"])
+
+    def test_repeated_placeholder(self):
+        template = Template("{{ Title }} - {{ Title }}")
+        self.assertEqual(template.render({"Title": "T"}), "T - T")
+
+    def test_no_placeholders(self):
+        template = Template("static text")
+        self.assertEqual(template.render({}), "static text")
+
+    def test_unknown_placeholder(self):
+        template = Template("{{ Title }} {{ Author }}")
+        with self.assertRaises(ValueError):
+            template.render({"Title": "T", "Content": ""})
+
+    def test_values_are_not_reparsed(self):
+        template = Template("{{ Title }}|{{ Content }}")
+        result = template.render({"Title": "{{ Content }}", "Content": "c"})
+        self.assertEqual(result, "{{ Content }}|c")
+
+    def test_pickle(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        clone = pickle.loads(pickle.dumps(template))
+        self.assertEqual(clone, template)
+        self.assertEqual(clone.render({"Title": "T", "Content": "C"}), "<h1>T</h1>C")
+
+    def test_load_template_cached_until_changed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as file:
+                file.write("{{ Title }}")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+
+            with open(path, "w") as file:
+                file.write("<b>{{ Title }}</b>")
+            os.utime(path, ns=(0, 0))
+            second = load_template(path)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.render({"Title": "T"}), "<b>T</b>")
+
+
+if __name__ == "__main__":
+    unittest.main()
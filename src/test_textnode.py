@@ -19,6 +19,10 @@ class TestTextNode(unittest.TestCase):
         node = TextNode("This is a text node", "bold", "123")
         node2 = TextNode("This is a text node", "italic", "123")
         self.assertNotEqual(node, node2)
+
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text node", "bold", None)
+        self.assertFalse(hasattr(node, "__dict__"))
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import warnings
+from walker import DEFAULT_IGNORE, is_ignored, walk_files
+
+
+class TestWalker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, rel_path):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write("x")
+
+    def walk(self, ignore=DEFAULT_IGNORE):
+        return [rel_path for rel_path, _ in walk_files(self.root, ignore)]
+
+    def test_sorted_depth_first(self):
+        for rel_path in ("b.md", "a/z.md", "a/b/c.md", "c/d.md", "a.md"):
+            self.touch(rel_path)
+        self.assertEqual(self.walk(), ["a/b/c.md", "a/z.md", "a.md", "b.md", "c/d.md"])
+
+    def test_entries_are_direntries(self):
+        self.touch("a/page.md")
+        [(rel_path, entry)] = walk_files(self.root)
+        self.assertEqual(entry.path, os.path.join(self.root, "a", "page.md"))
+        self.assertEqual(entry.name, "page.md")
+
+    def test_default_ignore(self):
+        for rel_path in ("page.md", ".git/HEAD", "page.md~", ".page.md.swp", "sub/#page.md#"):
+            self.touch(rel_path)
+        self.assertEqual(self.walk(), ["page.md"])
+
+    def test_ignore_patterns(self):
+        for rel_path in ("_drafts/a.md", "blog/_drafts/b.md", "blog/c.md", "blog/d.tmp.md", "d.tmp.md"):
+            self.touch(rel_path)
+        self.assertEqual(self.walk(["_drafts", "blog/*.tmp.md"]), ["blog/c.md", "d.tmp.md"])
+        self.assertTrue(is_ignored("x.swp", "a/x.swp", DEFAULT_IGNORE))
+
+    def test_symlink_loop_skipped(self):
+        self.touch("a/page.md")
+        os.symlink(self.root, os.path.join(self.root, "a", "loop"))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.assertEqual(self.walk(), ["a/page.md"])
+        self.assertEqual(len(caught), 1)
+        self.assertIn("symlink loop", str(caught[0].message))
+
+    def test_symlinked_directory_followed(self):
+        self.touch("real/page.md")
+        os.symlink(os.path.join(self.root, "real"), os.path.join(self.root, "alias"))
+        self.assertEqual(self.walk(), ["alias/page.md", "real/page.md"])
+
+    def test_deep_tree(self):
+        rel_path = "/".join(["d"] * 150) + "/page.md"
+        self.touch(rel_path)
+        self.assertEqual(self.walk(), [rel_path])
+
+if __name__ == "__main__":
+    unittest.main()
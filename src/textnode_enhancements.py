@@ -1,6 +1,8 @@
 import re
+from functools import lru_cache
 from textnode import TextNode
 from htmlnode import HTMLNode, LeafNode, ParentNode
+from terms import count_node
 
 def text_node_to_html_node(text_node):
     node_types = [
@@ -57,91 +59,106 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return result_nodes
 
 
+IMAGE_PATTERN = re.compile(r'!\[(.*?)\]\((.*?)\)')
+LINK_PATTERN = re.compile(r'\[(.*?)\]\((.*?)\)')
+
 def extract_markdown_images(text):
-    image_pattern = r'!\[(.*?)\]\((.*?)\)'
-    return re.findall(image_pattern, text)
+    return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text):  
-    link_pattern = r'\[(.*?)\]\((.*?)\)'
-    return re.findall(link_pattern, text)
+    return LINK_PATTERN.findall(text)
 
 def split_nodes_image(old_nodes):
-    result_nodes = []
-    
-    for node in old_nodes:
-        text = str(node.text)
-        if text == "":
-            continue
-        #print(f"Passing this text to extract_markdown_images: {text}")
-        extracted_images = extract_markdown_images(text)
-        #print(f'Extracted images: {extracted_images}')
-        if extracted_images == []:
-            result_nodes.append(node)
-        else:
-            for image in extracted_images:
-                alt_text, url = image
-                split_text = text.split(f'![{alt_text}]({url})', 1)
-                result_nodes.append(TextNode(split_text[0], 'text'))
-                result_nodes.append(TextNode(alt_text, 'image', url))
-                text = split_text[1]
-            if split_text[1] and not split_text[1] == "":
-                result_nodes.append(TextNode(split_text[1], 'text'))
-
-    return result_nodes
+    return _split_nodes_pattern(old_nodes, IMAGE_PATTERN, 'image')
 
 def split_nodes_link(old_nodes):
+    return _split_nodes_pattern(old_nodes, LINK_PATTERN, 'link')
 
+def _split_nodes_pattern(old_nodes, pattern, text_type):
     result_nodes = []
     
     for node in old_nodes:
         text = str(node.text)
         if text == "":
             continue
-        extracted_links = extract_markdown_links(text)
 
-        if extracted_links == []:
+        pos = 0
+        for match in pattern.finditer(text):
+            alt_text, url = match.groups()
+            result_nodes.append(TextNode(text[pos:match.start()], 'text'))
+            result_nodes.append(TextNode(alt_text, text_type, url))
+            pos = match.end()
+
+        if pos == 0:
             result_nodes.append(node)
-        else:
-            for link in extracted_links:
-                alt_text, url = link
-                split_text = text.split(f'[{alt_text}]({url})', 1)
-                result_nodes.append(TextNode(split_text[0], 'text'))
-                result_nodes.append(TextNode(alt_text, 'link', url))
-                text = split_text[1]
-            if split_text[1] and not split_text[1] == "":
-                result_nodes.append(TextNode(split_text[1], 'text'))
+        elif text[pos:]:
+            result_nodes.append(TextNode(text[pos:], 'text'))
 
     return result_nodes
 
-'''
-    def text_to_textnodes(text):
-        nodes = [TextNode(text, "text")]
-        resulting_nodes = []
-
-        splitting_functions = [
-            split_nodes_image,
-            split_nodes_link,
-            lambda nodes: split_nodes_delimiter(nodes, "**", "bold"),
-            lambda nodes: split_nodes_delimiter(nodes, "*", "italic"),
-            lambda nodes: split_nodes_delimiter(nodes, "`", "code")
-        ]
-        print(f'Current node {nodes}')
-        while nodes:
-            node = nodes.pop(0)
-            current_nodes = [node]
-            print(f'Current node {current_nodes}')
-            for split_fnc in splitting_functions:
-                current_nodes = split_fnc(current_nodes)
-            
-            resulting_nodes.extend(current_nodes)
-        
-        return resulting_nodes
-'''
+# Single pass inline scanner. Every inline element is one alternative of a
+# single regex, tried left to right in the order the old split passes
+# gave them priority. Image and link text may hold balanced brackets and
+# urls balanced parentheses, one level deep ("[see [1]](u)",
+# "(/wiki/Foo_(bar))"). Each repetition starts on a character the other
+# cannot, so a failed match never backtracks and the scan stays linear
+BRACKETED = r'(?:[^\[\]]|\[[^\[\]]*\])*'
+PARENTHESIZED = r'(?:[^()]|\([^()]*\))*'
+INLINE_PATTERN = re.compile(
+    rf'!\[(?P<image>{BRACKETED})\]\((?P<image_url>{PARENTHESIZED})\)'
+    rf'|\[(?P<link>{BRACKETED})\]\((?P<link_url>{PARENTHESIZED})\)'
+    r'|\*\*(?P<bold>.*?)\*\*'
+    r'|\*(?!\*)(?P<italic>[^*]*)\*'
+    r'|`(?P<code>[^`]*)`',
+    re.DOTALL,
+)
+INLINE_TYPES = {5: 'bold', 6: 'italic', 7: 'code'}
+
+def text_to_textnodes(text):
+    """
+    Split text into text, image, link, bold, italic and code TextNodes in
+    one left to right scan. Adjacent plain text is merged into one node
+    """
+    nodes = []
+    pos = 0
+    # plain text held back because an empty delimiter pair was dropped after it
+    carry = ''
+
+    for match in INLINE_PATTERN.finditer(text):
+        start = match.start()
+        index = match.lastindex
+        if index == 2:
+            inline = TextNode(match[1], 'image', match[2])
+        elif index == 4:
+            inline = TextNode(match[3], 'link', match[4])
+        else:
+            inner = match[index]
+            if not inner:
+                carry += text[pos:start]
+                pos = match.end()
+                continue
+            inline = TextNode(inner, INLINE_TYPES[index])
+
+        piece = text[pos:start]
+        if carry:
+            piece = carry + piece
+            carry = ''
+        if piece:
+            if '*' in piece or '`' in piece:
+                raise Exception(f"Mismatched delimiter in text: '{text}'")
+            nodes.append(TextNode(piece, 'text'))
+        nodes.append(inline)
+        pos = match.end()
+
+    piece = carry + text[pos:]
+    if piece:
+        if '*' in piece or '`' in piece:
+            raise Exception(f"Mismatched delimiter in text: '{text}'")
+        nodes.append(TextNode(piece, 'text'))
+    return nodes
 
 def markdown_to_blocks(markdown):
-    blocks = re.split('[\r\n][\r\n]+',markdown)
-    res = list(filter(lambda x: x,[block.strip() for block in blocks]))    
-    return res
+    return [block.text for block in BlockScanner(markdown)]
 
 def block_to_block_type(block):
     if block.startswith(("#")):
@@ -158,6 +175,17 @@ def block_to_block_type(block):
         return "paragraph"
 
 
+@lru_cache(maxsize=4096)
+def shared_props(*items):
+    """
+    Return one shared props dict per distinct set of (key, value) pairs, so
+    every link to the same url reuses the same dict. Callers must not
+    mutate the returned dict
+    """
+    return dict(items)
+
+HEADING_TAGS = tuple(f"h{level}" for level in range(7))
+
 def text_node_to_html_node_v2(text_node):
     node_types = [
         "text",
@@ -185,9 +213,9 @@ def text_node_to_html_node_v2(text_node):
         case "code":
             return HTMLNode("code", text_node.text)
         case "link":
-            return HTMLNode("a", text_node.text, None, {"href": text_node.url})
+            return HTMLNode("a", text_node.text, None, shared_props(("href", text_node.url)))
         case "image":
-            return HTMLNode("img", "", None, {"src": text_node.url, "alt": text_node.text})
+            return HTMLNode("img", "", None, shared_props(("src", text_node.url), ("alt", text_node.text)))
         case "inline_quote":
             return HTMLNode("q", text_node.text)
         case "inline_list_item":
@@ -195,18 +223,7 @@ def text_node_to_html_node_v2(text_node):
 
 
 def text_to_children(text):
-    text_node = TextNode(text,"text")
-
-    # Process for images
-    nodes = split_nodes_image([text_node])  
-    # Links
-    nodes = split_nodes_link(nodes) 
-    # Bold
-    nodes = split_nodes_delimiter(nodes, "**", "bold")
-    # Italic
-    nodes = split_nodes_delimiter(nodes, "*", "italic")
-    # Code
-    nodes = split_nodes_delimiter(nodes, "`", "code")
+    nodes = text_to_textnodes(text)
     
     html_nodes = []
     for node in nodes:
@@ -226,62 +243,233 @@ def determine_header_level(text):
 
     return count
 
-def strip_list_marker(item):
-    return re.sub(r'^(\d+\.|-|\*|\+)\s+', '', item)
+LIST_MARKER_PATTERN = re.compile(r'^(\d+\.|-|\*|\+)\s+')
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
+def strip_list_marker(item):
+    return LIST_MARKER_PATTERN.sub('', item)
+
+# a run of non-empty lines; a blank line ends the block
+BLOCK_PATTERN = re.compile(r'[^\r\n]+(?:\r?\n[^\r\n]+)*')
+
+
+class Block:
+    """
+    One markdown block with everything the renderer needs already worked
+    out: the inline text of headings, paragraphs, quotes and code, the
+    heading level, list items and the code fence info string
+    """
+    __slots__ = ('block_type', 'text', 'line', 'content', 'level', 'items', 'info')
+
+    def __init__(self, block_type, text, line, content=None, level=None, items=None, info=None):
+        self.block_type = block_type
+        self.text = text
+        self.line = line
+        self.content = content
+        self.level = level
+        self.items = items
+        self.info = info
+
+    def __eq__(self, other) -> bool:
+        return (
+            self.block_type == other.block_type and
+            self.text == other.text and
+            self.line == other.line
+        )
+
+    def __repr__(self) -> str:
+        return f"Block({self.block_type}, line={self.line}, {self.text!r})"
+
+
+def make_block(raw, line):
+    """Build the Block for the raw lines of a block starting on line"""
+    text = raw.strip()
+    if not text:
+        return None
+    if raw[0] != text[0]:
+        line += raw.count('\n', 0, raw.index(text[0]))
+
+    # same rules as block_to_block_type, dispatched on the first character
+    first = text[0]
+    if first == '#':
+        return Block('heading', text, line, text.lstrip('#').strip(), level=len(text) - len(text.lstrip('#')))
+    if first == '`' and text.startswith('```') and text.endswith('```'):
+        info = text[3:text.find('\n')].strip() if '\n' in text else ''
+        return Block('code', text, line, text.strip('`').strip('\n'), info=info)
+    if first == '>':
+        return Block('quote', text, line, text.lstrip("> ").strip())
+    if (first == '*' or first == '-') and text[1:2] == ' ':
+        return Block('unordered_list', text, line, items=_list_items(text))
+    if first == '1' and text[1:2] == '.':
+        return Block('ordered_list', text, line, items=_list_items(text))
+    return Block('paragraph', text, line, text)
+
+def _list_items(text):
+    sub = LIST_MARKER_PATTERN.sub
+    return [sub('', item).strip() for item in text.split('\n')]
+
+
+class BlockScanner:
+    """
+    Scan a markdown document once, yielding its Blocks in order. The first
+    line starting with '#' is captured as title on the way
+    """
+    def __init__(self, markdown):
+        self.markdown = markdown
+        self.title = None
+
+    def __iter__(self):
+        markdown = self.markdown
+        line = 1
+        last = 0
+        for match in BLOCK_PATTERN.finditer(markdown):
+            start = match.start()
+            line += markdown.count('\n', last, start)
+            last = start
+            raw = match.group()
+            if self.title is None:
+                self.title = find_title(raw)
+            block = make_block(raw, line)
+            if block is not None:
+                yield block
+
+
+class LineBlockScanner:
+    """
+    Yield the Blocks of markdown read line by line from a file or any
+    iterable of lines, holding no more than one block in memory
+    """
+    def __init__(self, lines):
+        self.lines = lines
+
+    def __iter__(self):
+        pending = []
+        start = 1
+        for number, line in enumerate(self.lines, 1):
+            line = line.rstrip('\n').rstrip('\r')
+            if line:
+                if not pending:
+                    start = number
+                pending.append(line)
+            elif pending:
+                block = make_block('\n'.join(pending), start)
+                pending = []
+                if block is not None:
+                    yield block
+        if pending:
+            block = make_block('\n'.join(pending), start)
+            if block is not None:
+                yield block
+
+
+def find_title(raw):
+    """Return the text of the first line of raw starting with '#', or None"""
+    if raw.startswith('#'):
+        start = 0
+    else:
+        start = raw.find('\n#') + 1
+        if start == 0:
+            return None
+    end = raw.find('\n', start)
+    line = raw[start:end] if end != -1 else raw[start:]
+    return line.lstrip('#').strip()
+
+def find_title_in_lines(lines):
+    """Return the text of the first of lines starting with '#', or None"""
+    for line in lines:
+        if line.startswith('#'):
+            return line.rstrip('\n').lstrip('#').strip()
+    return None
+
+
+def block_to_html_node(block):
+    block_type = block.block_type
+
+    if block_type == 'paragraph':
+        node = HTMLNode('p')
+        node.children = text_to_children(block.content)
+    elif block_type == 'heading':
+        level = block.level
+        node = HTMLNode(HEADING_TAGS[level] if level < len(HEADING_TAGS) else f"h{level}")
+        node.children = text_to_children(block.content)
+    elif block_type == "code":
+        node = HTMLNode("pre")
+        code_node = HTMLNode("code")
+        code_text_node = HTMLNode(None, block.content)
+        
+        code_node.add_child(code_text_node)
+        node.add_child(code_node)
+    elif block_type == "quote":
+        node = HTMLNode("blockquote")
+        node.children = text_to_children(block.content)
+    elif block_type == 'unordered_list' or block_type == 'ordered_list':
+        node = HTMLNode('ul' if block_type == 'unordered_list' else 'ol')
+        # Handle list items
+        for item in block.items:
+            li_node = HTMLNode('li')
+            li_node.children = text_to_children(item)
+            node.add_child(li_node)
+    else:
+        raise Exception("Uknown block type")
+    return node
+
+def blocks_to_html_node(blocks, block_cache=None, counts=None):
+    """
+    Build the page's div. With a block_cache.BlockCache, blocks seen
+    before become raw HTML children instead of being parsed again
+    """
     main_Html = HTMLNode('div')
-
     for block in blocks:
-        block_type = block_to_block_type(block)
-
-        if block_type == 'paragraph':
-            node = HTMLNode('p')
-            node.children = text_to_children(block)
-        elif block_type == 'heading':
-            level = determine_header_level(block)
-            node = HTMLNode(f"h{level}")
-            heading_text = block.lstrip('#').strip()
-            node.children = text_to_children(heading_text)
-        elif block_type == "code":
-            code_content = block.strip().strip('`').strip('\n')
-            
-            node = HTMLNode("pre")
-            code_node = HTMLNode("code")
-            code_text_node = HTMLNode(None, code_content)
-            
-            code_node.add_child(code_text_node)
-            node.add_child(code_node)
-        elif block_type == "quote":
-            node = HTMLNode("blockquote")
-            #p_node = HTMLNode("p")
-            node.children = text_to_children(block.lstrip("> ").strip())
-            #node.add_child(p_node)
-        elif block_type == 'unordered_list':
-            node = HTMLNode('ul')
-            # Handle list items
-            #print(f"Processing unordered list: '{block}'")
-            for item in block.split("\n"):
-                li_node = HTMLNode('li')
-                li_node.children = text_to_children(strip_list_marker(item).strip())
-                node.add_child(li_node)
-        elif block_type == 'ordered_list':
-            node = HTMLNode('ol')
-            # Handle list items
-            for item in block.split("\n"):
-                li_node = HTMLNode('li')
-                li_node.children = text_to_children(strip_list_marker(item).strip())
-                node.add_child(li_node)
-        else:
-            raise Exception("Uknown block type")
-        main_Html.add_child(node) 
-
+        main_Html.add_child(cached_block_node(block, block_cache, counts))
     return main_Html
 
+def cached_block_node(block, block_cache=None, counts=None):
+    """
+    The HTMLNode of a block, or a raw HTML node for a block found in the
+    block_cache. A counts Counter is given the search terms of the
+    block's text, counted from its nodes when it is parsed and kept in
+    the cache beside its HTML
+    """
+    if block_cache is None:
+        node = block_to_html_node(block)
+        if counts is not None:
+            counts.update(count_node(node))
+        return node
+    key = (block.block_type, block.text)
+    cached = block_cache.get(key)
+    if cached is None or (counts is not None and cached[1] is None):
+        node = block_to_html_node(block)
+        cached = (node.to_html(), count_node(node) if counts is not None else None)
+        block_cache.put(key, cached)
+    if counts is not None:
+        counts.update(cached[1])
+    return HTMLNode(None, cached[0])
+
+def iter_blocks_html(blocks, block_cache=None, counts=None):
+    """
+    Yield the same HTML as blocks_to_html_node(blocks).iter_html(), building
+    the nodes of one block at a time
+    """
+    yield '<div>'
+    for block in blocks:
+        yield from cached_block_node(block, block_cache, counts).iter_html()
+    yield '</div>'
+
+def markdown_to_html_node(markdown, block_cache=None):
+    return blocks_to_html_node(BlockScanner(markdown), block_cache)
+
+def markdown_to_page(markdown, block_cache=None, counts=None):
+    """
+    Parse a page in one scan, returning its title and its HTMLNode tree.
+    A counts Counter is given the search terms of the text
+    """
+    scanner = BlockScanner(markdown)
+    node = blocks_to_html_node(scanner, block_cache, counts)
+    if scanner.title is None:
+        raise Exception('No Header!')
+    return scanner.title, node
+
 def extract_title(markdown):
     for line in markdown.splitlines():
         if line.startswith(("#","##","###","####","#####","######")):
             return line.lstrip("#").strip()
     raise Exception('No Header!')
-    
\ No newline at end of file
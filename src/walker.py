@@ -0,0 +1,52 @@
+import fnmatch
+import os
+import warnings
+
+# version control metadata and editor leftovers never belong in the site
+DEFAULT_IGNORE = ('.git', '.hg', '.svn', '.DS_Store', '*.swp', '*.swo', '*~', '.#*', '#*#')
+
+
+def is_ignored(name, rel_path, ignore):
+    """
+    Whether a file or directory matches one of the ignore glob patterns.
+    Patterns containing '/' are matched against the path relative to the
+    walk root, all others against the name alone
+    """
+    for pattern in ignore:
+        if fnmatch.fnmatchcase(rel_path if '/' in pattern else name, pattern):
+            return True
+    return False
+
+def _sorted_entries(path):
+    with os.scandir(path) as entries:
+        return sorted(entries, key=lambda entry: entry.name)
+
+def walk_files(root, ignore=DEFAULT_IGNORE):
+    """
+    Yield (rel_path, entry) for every file under root, where entry is the
+    os.DirEntry of the file and rel_path uses '/' separators. Directories
+    are visited depth first in name order, without recursion and without
+    a stat per file: the type comes from the directory listing. Ignored
+    names are skipped along with everything below them, and a symlink
+    back to a directory being walked is skipped with a warning
+    """
+    root_stat = os.stat(root)
+    stack = [(iter(_sorted_entries(root)), '', frozenset([(root_stat.st_dev, root_stat.st_ino)]))]
+    while stack:
+        entries, rel_dir, ancestors = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+        if ignore and is_ignored(entry.name, rel_path, ignore):
+            continue
+        if entry.is_dir():
+            stat = entry.stat()
+            key = (stat.st_dev, stat.st_ino)
+            if key in ancestors:
+                warnings.warn(f'skipping symlink loop at {entry.path}')
+                continue
+            stack.append((iter(_sorted_entries(entry.path)), rel_path, ancestors | {key}))
+        elif entry.is_file():
+            yield rel_path, entry